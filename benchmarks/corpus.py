@@ -0,0 +1,147 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+from random import Random
+from typing import Callable, Optional
+
+from spip2md.regexmaps import ISO_UTF, UNKNOWN_ISO
+
+# Words of which generated sentences are made
+WORDS = (
+    "le laboratoire de chimie et physique quantiques étudie la structure électronique"
+    + " des molécules théorie méthodes calcul été équipe séminaire thèse résultats"
+    + " the group develops numerical methods for quantum chemistry and physics"
+).split()
+
+
+# Generator of random SPIP markup, the same for a given seed
+class Corpus:
+    def __init__(
+        self,
+        seed: int = 0,
+        langs: tuple[str, ...] = ("fr", "en"),
+        targets: Optional[dict[str, int]] = None,  # Maximum ID of links by kind
+        links: float = 0.05,  # Probability of an internal link after each sentence
+        mojibake: float = 0.02,  # Probability of a broken encoding after each word
+        html: float = 0.05,  # Probability of HTML after each sentence
+    ):
+        self.rng = Random(seed)
+        self.langs = langs
+        self.targets: dict[str, int] = (
+            targets
+            if targets is not None
+            else {"art": 1000, "rub": 1000, "doc": 1000, "img": 1000}
+        )
+        self.links = links
+        self.mojibake = mojibake
+        self.html = html
+
+    # Count words, with eventually broken encodings between them
+    def words(self, count: int) -> str:
+        words: list[str] = []
+        for _ in range(count):
+            words.append(self.rng.choice(WORDS))
+            if self.rng.random() < self.mojibake:
+                words.append(self.rng.choice(ISO_UTF)[0] + self.rng.choice(WORDS))
+            if self.rng.random() < self.mojibake / 10:
+                words.append(self.rng.choice(UNKNOWN_ISO))
+        return " ".join(words)
+
+    # A sentence with inline markup, and eventually links & HTML
+    def sentence(self) -> str:
+        text: str = self.words(self.rng.randint(3, 15))
+        inline: Callable[[str], str] = self.rng.choice(
+            (
+                lambda t: t,
+                lambda t: t,
+                lambda t: "{{" + t + "}}",
+                lambda t: "{" + t + "}",
+                lambda t: "[" + t + "->https://example.org/" + t[:10] + "]",
+                lambda t: "[?" + t.split(" ")[0] + "]",
+                lambda t: t + "[[" + self.words(5) + "]]",
+            )
+        )
+        text = inline(text) + "."
+        kinds: list[str] = [kind for kind, count in self.targets.items() if count > 0]
+        if len(kinds) > 0 and self.rng.random() < self.links:
+            kind: str = self.rng.choice(kinds)
+            target: int = self.rng.randint(1, self.targets[kind])
+            if kind in ("doc", "img"):
+                text += f" <{kind}{target}|center>"
+            else:
+                text += f" [{self.words(2)}->{kind}{target}]"
+        if self.rng.random() < self.html:
+            text += self.rng.choice(
+                (
+                    "<br/>",
+                    "<p class='spip'>" + self.words(4) + "</p>",
+                    "<span style='color: red'>" + self.words(2) + "</span>",
+                    "<a href='https://example.org'>" + self.words(2) + "</a>",
+                )
+            )
+        return text
+
+    # A block: paragraph, heading, list, quote, table, code or <multi> block
+    def block(self, multi: bool = True) -> str:
+        kind: float = self.rng.random()
+        if kind < 0.5:
+            return " ".join(self.sentence() for _ in range(self.rng.randint(1, 6)))
+        if kind < 0.6:
+            return "{{{" + self.words(self.rng.randint(2, 6)) + "}}}"
+        if kind < 0.7:
+            item: str = self.rng.choice(("-* ", "-# ", "- "))
+            return "\n".join(item + self.sentence() for _ in range(3))
+        if kind < 0.75:
+            return "<quote>" + self.sentence() + "</quote>"
+        if kind < 0.8:
+            return (
+                "||"
+                + self.words(3)
+                + "||\n"
+                + "\n".join(
+                    "| " + " | ".join(self.words(1) for _ in range(3)) + " |"
+                    for _ in range(3)
+                )
+            )
+        if kind < 0.85:
+            return "<code>" + self.words(8) + "</code>"
+        if kind < 0.9:
+            return "----"
+        if multi:
+            return self.multi(lambda: self.block(False))
+        return self.sentence()
+
+    # A <multi> block with a translation in each lang
+    def multi(self, text: Callable[[], str]) -> str:
+        return (
+            "<multi>"
+            + "".join(f"[{lang}] {text()} " for lang in self.langs)
+            + "</multi>"
+        )
+
+    # A body of at least size chars
+    def text(self, size: int) -> str:
+        blocks: list[str] = []
+        length: int = 0
+        while length < size:
+            blocks.append(self.block())
+            length += len(blocks[-1]) + 2
+        return "\n\n".join(blocks)
+
+    # A title, eventually in a <multi> block
+    def title(self) -> str:
+        if self.rng.random() < 0.3:
+            return self.multi(lambda: self.words(self.rng.randint(2, 8)))
+        return self.words(self.rng.randint(2, 8))
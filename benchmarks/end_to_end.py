@@ -0,0 +1,165 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Export a synthetic SPIP site with spip2md, and print as JSON the wall time, the
+# number of exported objects per second, the CPU time & peak memory of the exporting
+# process and of its worker processes. Each run exports in a new process, configured
+# by a generated configuration file to which options can be added. Queries aren’t
+# profiled during the timed runs, but during an extra run. Run from the repository
+# root:
+#   python -m benchmarks.end_to_end --articles 10000 --runs 3 --option preload=true
+import json
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from os import makedirs, walk
+from os.path import abspath, join, splitext
+from resource import RUSAGE_CHILDREN, RUSAGE_SELF, getrusage
+from subprocess import run
+from sys import argv, executable
+from tempfile import mkdtemp
+from time import perf_counter
+from typing import Any
+
+from yaml import dump, safe_load
+
+from benchmarks.site import add_arguments, from_arguments
+from spip2md.config import CFG
+from spip2md.lib import cli
+from spip2md.profiler import PROFILER
+
+
+# Export with the configuration file given as first argument, then print the
+# measures as JSON. Runs in a process of its own so that only its memory is measured.
+# If count_queries, queries are profiled, slowing the export down
+def measure(count_queries: bool = False) -> None:
+    if count_queries:
+        CFG.profile_queries = max(CFG.profile_queries, 1)
+    start: float = perf_counter()
+    with redirect_stdout(StringIO()):
+        cli()
+    wall: float = perf_counter() - start
+    usage = getrusage(RUSAGE_SELF)
+    # Worker processes, that were all waited for at the end of the export
+    children = getrusage(RUSAGE_CHILDREN)
+    texts: int = 0
+    documents: int = 0
+    for _, _, files in walk(CFG.output_dir):
+        for name in files:
+            if splitext(name)[1] == "." + CFG.export_filetype:
+                texts += 1
+            else:
+                documents += 1
+    print(
+        json.dumps(
+            {
+                "wall": wall,
+                "texts": texts,
+                "documents": documents,
+                "objects_per_second": (texts + documents) / wall,
+                "cpu_time": usage.ru_utime + usage.ru_stime,
+                "peak_rss_kb": usage.ru_maxrss,
+                "children_cpu_time": children.ru_utime + children.ru_stime,
+                # Of the largest worker process
+                "children_peak_rss_kb": children.ru_maxrss,
+                **(
+                    {
+                        "queries": sum(s.count for s in PROFILER.stats.values()),
+                        "query_time": sum(s.time for s in PROFILER.stats.values()),
+                    }
+                    if count_queries
+                    else {}
+                ),
+            }
+        )
+    )
+
+
+# Export in a new process, measured as told by mode, and return its measures
+def measured(config_file: str, mode: str) -> dict[str, Any]:
+    process = run(
+        [executable, "-m", "benchmarks.end_to_end", config_file, mode],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark exporting a synthetic SPIP site")
+    add_arguments(parser)
+    parser.add_argument("--workdir", help="Where to generate the site & export it")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        help="Configuration option of the export, as name=YAML value",
+    )
+    parser.add_argument("--output", help="JSON file to write, instead of stdout")
+    args = parser.parse_args()
+    workdir: str = abspath(
+        args.workdir if args.workdir is not None else mkdtemp(prefix="spip2md-")
+    )
+    makedirs(workdir, exist_ok=True)
+    site = from_arguments(args)
+    counter: dict[str, int] = site.write(
+        join(workdir, "site.sqlite"), join(workdir, "IMG/")
+    )
+    config: dict[str, Any] = {
+        "db_type": "sqlite",
+        "db": join(workdir, "site.sqlite"),
+        "data_dir": join(workdir, "IMG/"),
+        "output_dir": join(workdir, "output/"),
+        "logfile": join(workdir, "spip2md.log"),
+        "export_languages": list(site.languages),
+        "storage_language": site.languages[0],
+    }
+    for option in args.option:
+        name, value = option.split("=", 1)
+        config[name] = safe_load(value)
+    config_file: str = join(workdir, "spip2md.yml")
+    with open(config_file, "w") as f:
+        f.write(dump(config))
+    runs: list[dict[str, Any]] = [
+        measured(config_file, "--measure") for _ in range(args.runs)
+    ]
+    profiled: dict[str, Any] = measured(config_file, "--count-queries")
+    output: str = json.dumps(
+        {
+            "site": counter,
+            "config": config,
+            "runs": runs,
+            "best_wall": min(r["wall"] for r in runs),
+            "queries": profiled["queries"],
+            "query_time": profiled["query_time"],
+        },
+        indent=2,
+    )
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    if "--measure" in argv:
+        measure()
+    elif "--count-queries" in argv:
+        measure(True)
+    else:
+        main()
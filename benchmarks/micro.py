@@ -0,0 +1,204 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Time the conversion hot paths on synthetic SPIP markup of several sizes, and
+# print the results as JSON. Run from the repository root:
+#   python -m benchmarks.micro --sizes 1000,10000,100000 --output results.json
+import json
+import logging
+from argparse import ArgumentParser
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from platform import python_version
+from time import perf_counter
+from typing import Any, Callable
+
+from slugify import slugify
+from yaml import dump
+
+from benchmarks.corpus import Corpus
+from spip2md.config import CFG, NAME
+from spip2md.extended_models import LINKS, Article, SpipWritable
+from spip2md.regexmaps import (
+    BLOAT,
+    HTMLTAGS,
+    ISO_UTF,
+    SPIP_MARKDOWN,
+    UNKNOWN_ISO_PATTERN,
+)
+from spip2md.tokenizer import convert as tokenize
+
+# Don’t print the warnings of the benchmarked functions
+logging.getLogger(NAME).addHandler(logging.NullHandler())
+logging.getLogger(NAME).propagate = False
+
+
+# Get an article, not saved in any database, with its conversions set up
+def article(corpus: Corpus) -> Article:
+    art = Article(id_article=1, id_rubrique=1, titre=corpus.title(), lang="fr")
+    art._url_title = art.titre
+    return art
+
+
+# Make every internal link of corpus resolve, without any database
+def index_links(corpus: Corpus, storage_lang: str) -> None:
+    LINKS._titles[storage_lang] = {}
+    LINKS._directories[storage_lang] = {("article", 1): "section/article/"}
+    LINKS._appends[storage_lang] = {}
+    LINKS._langs[storage_lang] = {}  # Linked in the language of the source
+    LINKS._documents[storage_lang] = {}
+    for objet, kind in (("article", "art"), ("rubrique", "rub")):
+        for i in range(1, corpus.targets[kind] + 1):
+            LINKS._titles[storage_lang][(objet, i)] = corpus.words(3)
+            LINKS._directories[storage_lang][(objet, i)] = f"{objet}-{i}/"
+    for i in range(1, max(corpus.targets["doc"], corpus.targets["img"]) + 1):
+        LINKS._documents[storage_lang][i] = (
+            corpus.words(2),
+            f"doc-{i}.pdf",
+            [("article", 1)],  # Along with the article of the benchmarks
+        )
+
+
+# Time fn on each input, return the best & mean time of repeat runs, in seconds
+def measure(fn: Callable[[Any], Any], inputs: list[Any], repeat: int) -> list[float]:
+    times: list[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        for i in inputs:
+            fn(i)
+        times.append(perf_counter() - start)
+    return [min(times), sum(times) / len(times)]
+
+
+# Run every benchmark with texts of each size
+def run(sizes: list[int], repeat: int, seed: int) -> list[dict[str, Any]]:
+    corpus = Corpus(seed, CFG.export_languages)
+    storage_lang: str = CFG.storage_language or CFG.export_languages[0]
+    index_links(corpus, storage_lang)
+    obj: Article = article(corpus)
+    results: list[dict[str, Any]] = []
+    for size in sizes:
+        # Inputs of a total size of about 10 times the largest size
+        count: int = max(1, 10 * max(sizes) // size)
+        texts: list[str] = [corpus.text(size) for _ in range(count)]
+        titles: list[str] = [corpus.title() for _ in range(count)]
+        lang: str = CFG.export_languages[-1]
+        translated: list[str] = [obj.translate_multi(lang, t, False) for t in texts]
+        converted: list[str] = [obj.convert_field(t) for t in translated]
+        benchmarks: dict[str, tuple[Callable[[Any], Any], list[Any]]] = {
+            "convert_field": (obj.convert_field, translated),
+            "apply_mapping SPIP_MARKDOWN": (
+                lambda t: SpipWritable.apply_mapping(t, SPIP_MARKDOWN),
+                translated,
+            ),
+            "tokenizer": (tokenize, translated),
+            "apply_mapping BLOAT": (
+                lambda t: SpipWritable.apply_mapping(t, BLOAT),
+                converted,
+            ),
+            "apply_mapping ISO_UTF": (
+                lambda t: SpipWritable.apply_mapping(t, ISO_UTF),
+                converted,
+            ),
+            "repair_encoding": (obj.repair_encoding, converted),
+            "apply_mapping HTMLTAGS": (
+                lambda t: SpipWritable.apply_mapping(t, HTMLTAGS),
+                converted,
+            ),
+            "warn_unknown": (
+                lambda t: obj.warn_unknown(t, UNKNOWN_ISO_PATTERN),
+                converted,
+            ),
+            # With an empty cache of <multi> blocks, as for a newly fetched object
+            "translate_multi": (
+                lambda t: article(corpus).translate_multi(lang, t, False),
+                texts,
+            ),
+            "replace_links": (obj.replace_links, translated),
+            "slugify": (
+                lambda t: slugify(t, max_length=CFG.title_max_length),
+                titles,
+            ),
+            "frontmatter": (
+                lambda t: dump(
+                    {
+                        "lang": lang,
+                        "translationKey": 1,
+                        "title": t,
+                        "publishDate": datetime(2023, 1, 1),
+                        "lastmod": datetime(2023, 1, 2),
+                        "draft": False,
+                        "description": t,
+                        "summary": t,
+                        "authors": [t[:20], t[-20:]],
+                        "tags": t.split(" "),
+                    },
+                    allow_unicode=True,
+                ),
+                [t[: min(size, 200)] for t in converted],
+            ),
+        }
+        for name, (fn, inputs) in benchmarks.items():
+            best, mean = measure(fn, inputs, repeat)
+            chars: int = sum(len(i) for i in inputs)
+            results.append(
+                {
+                    "name": name,
+                    "size": size,
+                    "inputs": len(inputs),
+                    "best": best,
+                    "mean": mean,
+                    "chars_per_second": chars / best if best > 0 else None,
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark the conversion hot paths")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=("regex", "tokenizer"))
+    parser.add_argument("--output", help="JSON file to write, instead of stdout")
+    args, _ = parser.parse_known_args()  # Other args can be a config file
+    if args.engine is not None:
+        CFG.markup_engine = args.engine
+    try:
+        spip2md_version: str = version(NAME)
+    except PackageNotFoundError:
+        spip2md_version = "unknown"
+    output: str = json.dumps(
+        {
+            "spip2md": spip2md_version,
+            "python": python_version(),
+            "markup_engine": CFG.markup_engine,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "results": run(
+                [int(s) for s in args.sizes.split(",")], args.repeat, args.seed
+            ),
+        },
+        indent=2,
+    )
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
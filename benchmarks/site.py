@@ -0,0 +1,281 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Generate a synthetic SPIP site: a SQLite database with the tables of the SPIP
+# schema that spip2md reads, and dummy files of its documents. Run from the
+# repository root:
+#   python -m benchmarks.site --articles 10000 --db site.sqlite --data-dir IMG/
+from argparse import ArgumentParser
+from os import makedirs, remove
+from os.path import isfile, join
+from random import Random
+from typing import Any
+
+from peewee import Model, SqliteDatabase
+
+from benchmarks.corpus import Corpus
+from spip2md.database import create_sqlite_tables
+from spip2md.spip_models import (
+    SpipArticles,
+    SpipAuteurs,
+    SpipAuteursLiens,
+    SpipDocuments,
+    SpipDocumentsLiens,
+    SpipMots,
+    SpipMotsLiens,
+    SpipRubriques,
+)
+
+# Number of rows inserted at once
+INSERT_BATCH = 1000
+# Types of keywords, the last one being ignored by default configuration
+KEYWORD_TYPES = ("themes", "equipes", "Mise en page")
+# Extensions of documents, the first ones being images
+DOCUMENT_TYPES = ("jpg", "png", "pdf", "odt")
+
+
+# Parameters of a synthetic site
+class Site:
+    def __init__(
+        self,
+        sections: int = 50,  # Number of sections
+        depth: int = 4,  # Maximum depth of the tree of sections
+        articles: int = 1000,  # Number of articles, spread among sections
+        documents: int = 200,  # Number of documents, attached to articles
+        authors: int = 20,  # Number of authors, 1 to 3 per article
+        keywords: int = 30,  # Number of keywords, 0 to 3 per article
+        languages: tuple[str, ...] = ("fr", "en"),  # Languages of <multi> blocks
+        links: float = 0.05,  # Probability of an internal link after each sentence
+        text_size: int = 5000,  # Mean number of characters of articles texts
+        document_size: int = 10000,  # Mean number of bytes of documents files
+        seed: int = 0,
+    ):
+        self.sections = sections
+        self.depth = depth
+        self.articles = articles
+        self.documents = documents
+        self.authors = authors
+        self.keywords = keywords
+        self.languages = languages
+        self.text_size = text_size
+        self.document_size = document_size
+        self.rng = Random(seed)
+        self.corpus = Corpus(
+            seed,
+            languages,
+            {
+                "art": articles,
+                "rub": sections,
+                "doc": documents,
+                "img": documents,
+            },
+            links,
+        )
+
+    def date(self, year: int) -> str:
+        return (
+            f"{year}-{self.rng.randint(1, 12):02d}-{self.rng.randint(1, 28):02d}"
+            + f" {self.rng.randint(0, 23):02d}:{self.rng.randint(0, 59):02d}:00"
+        )
+
+    # Rows of sections, each child of a random section that isn’t too deep
+    def section_rows(self) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        depths: dict[int, int] = {0: -1}
+        sectors: dict[int, int] = {}
+        for i in range(1, self.sections + 1):
+            parents: list[int] = [s for s, d in depths.items() if d < self.depth - 1]
+            parent: int = self.rng.choice(parents)
+            depths[i] = depths[parent] + 1
+            sectors[i] = sectors.get(parent, i)
+            rows.append(
+                {
+                    "id_rubrique": i,
+                    "id_parent": parent,
+                    "id_secteur": sectors[i],
+                    "titre": self.corpus.title(),
+                    "descriptif": self.corpus.words(10),
+                    "texte": self.corpus.text(self.text_size // 4),
+                    "lang": self.rng.choice(self.languages),
+                    "langue_choisie": "non",
+                    "statut": "publie",
+                    "date": self.date(2015),
+                    "maj": self.date(2020),
+                    "profondeur": depths[i],
+                }
+            )
+        return rows
+
+    def article_rows(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "id_article": i,
+                "id_rubrique": self.rng.randint(1, self.sections),
+                "surtitre": "",
+                "titre": self.corpus.title(),
+                "soustitre": self.corpus.words(5),
+                "chapo": self.corpus.text(self.text_size // 10),
+                "texte": self.corpus.text(
+                    self.rng.randint(self.text_size // 2, self.text_size * 3 // 2)
+                ),
+                "ps": self.rng.choice(("", self.corpus.words(20))),
+                "microblog": "",
+                "descriptif": self.corpus.words(10),
+                "lang": self.rng.choice(self.languages),
+                "langue_choisie": "non",
+                "statut": self.rng.choice(("publie", "publie", "publie", "prepa")),
+                "date": self.date(2018),
+                "date_redac": self.date(2017),
+                "maj": self.date(2021),
+                "accepter_forum": "non",
+            }
+            for i in range(1, self.articles + 1)
+        ]
+
+    # Rows of documents, writing their dummy files in data_dir
+    def document_rows(self, data_dir: str) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        for i in range(1, self.documents + 1):
+            extension: str = self.rng.choice(DOCUMENT_TYPES)
+            name: str = f"{extension}/document{i}.{extension}"
+            makedirs(join(data_dir, extension), exist_ok=True)
+            with open(join(data_dir, name), "wb") as f:
+                f.write(
+                    self.rng.randbytes(
+                        self.rng.randint(
+                            self.document_size // 2, self.document_size * 3 // 2
+                        )
+                    )
+                )
+            rows.append(
+                {
+                    "id_document": i,
+                    "titre": self.corpus.title(),
+                    "descriptif": self.corpus.words(10),
+                    "fichier": name,
+                    "statut": "publie",
+                    "maj": self.date(2021),
+                }
+            )
+        return rows
+
+    # Rows of a *_liens table, linking each article to minimum up to maximum of the
+    # count objects of key
+    def link_rows(
+        self, key: str, count: int, minimum: int, maximum: int
+    ) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        for id_article in range(1, self.articles + 1):
+            linked: int = min(count, self.rng.randint(minimum, maximum))
+            for i in self.rng.sample(range(1, count + 1), linked):
+                rows.append({key: i, "id_objet": id_article, "objet": "article"})
+        return rows
+
+    # Write the site into a new SQLite database at path, and its documents files
+    # into data_dir, returning the number of rows of each table
+    def write(self, path: str, data_dir: str) -> dict[str, int]:
+        if isfile(path):
+            remove(path)
+        db = SqliteDatabase(path, pragmas={"journal_mode": "off", "synchronous": 0})
+        tables: dict[type[Model], list[dict[str, Any]]] = {
+            SpipRubriques: self.section_rows(),
+            SpipArticles: self.article_rows(),
+            SpipDocuments: self.document_rows(data_dir),
+            SpipDocumentsLiens: self.link_rows("id_document", self.documents, 0, 2),
+            SpipAuteurs: [
+                {"id_auteur": i, "nom": self.corpus.words(2), "statut": "1comite"}
+                for i in range(1, self.authors + 1)
+            ],
+            SpipAuteursLiens: self.link_rows("id_auteur", self.authors, 1, 3),
+            SpipMots: [
+                {
+                    "id_mot": i,
+                    "titre": self.corpus.words(1),
+                    "type": self.rng.choice(KEYWORD_TYPES),
+                    "descriptif": self.corpus.title(),
+                }
+                for i in range(1, self.keywords + 1)
+            ],
+            SpipMotsLiens: self.link_rows("id_mot", self.keywords, 0, 3),
+        }
+        counter: dict[str, int] = {}
+        with db:
+            create_sqlite_tables(db)
+            with db.atomic():
+                for model, rows in tables.items():
+                    table: str = model._meta.table_name
+                    counter[table] = len(rows)
+                    for i in range(0, len(rows), INSERT_BATCH):
+                        batch = rows[i : i + INSERT_BATCH]
+                        columns: list[str] = list(batch[0])
+                        db.cursor().executemany(
+                            f'INSERT INTO "{table}"'
+                            + f""" ({", ".join(f'"{c}"' for c in columns)})"""
+                            + f" VALUES ({', '.join('?' for _ in columns)})",
+                            [tuple(row[c] for c in columns) for row in batch],
+                        )
+        return counter
+
+
+# Add the parameters of Site to parser
+def add_arguments(parser: ArgumentParser) -> None:
+    defaults = Site()
+    for name in (
+        "sections",
+        "depth",
+        "articles",
+        "documents",
+        "authors",
+        "keywords",
+        "text_size",
+        "document_size",
+    ):
+        parser.add_argument(
+            "--" + name.replace("_", "-"), type=int, default=getattr(defaults, name)
+        )
+    parser.add_argument("--languages", default=",".join(defaults.languages))
+    parser.add_argument("--links", type=float, default=defaults.corpus.links)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+# Get the Site of arguments parsed by a parser with add_arguments
+def from_arguments(args: Any) -> Site:
+    return Site(
+        args.sections,
+        args.depth,
+        args.articles,
+        args.documents,
+        args.authors,
+        args.keywords,
+        tuple(args.languages.split(",")),
+        args.links,
+        args.text_size,
+        args.document_size,
+        args.seed,
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Generate a synthetic SPIP site")
+    add_arguments(parser)
+    parser.add_argument("--db", default="spip2md-benchmark.sqlite")
+    parser.add_argument("--data-dir", default="spip2md-benchmark-IMG/")
+    args = parser.parse_args()
+    counter = from_arguments(args).write(args.db, args.data_dir)
+    print(", ".join(f"{rows} {table}" for table, rows in counter.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import logging
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from os import listdir
+from os.path import dirname, expanduser, join
+from typing import Optional
+
+from peewee import SqliteDatabase
+
+from spip2md.config import CFG, NAME
+from spip2md.style import BOLD, esc
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".cache")
+
+# Table of the cache database in which conversions are stored
+CACHE_TABLE = "spip2md_conversions"
+# Number of keys read, touched, inserted or evicted with one query
+CACHE_BATCH = 500
+# Configuration options on which the output of SpipWritable.convert_field depends
+CACHE_OPTIONS = ("markup_engine", "remove_html", "unknown_char_replacement")
+# Columns of the cache table
+CACHE_COLUMNS = ("key", "output", "repairs", "size", "used")
+
+Cached = tuple[str, dict[str, int]]  # Converted field & broken encodings it repaired
+
+
+# Persistent cache of converted fields, keyed by a hash of the field, of the
+# conversion configuration & of spip2md sources, evicting least recently used ones.
+# The broken encodings repaired by conversions are kept with them, to be counted
+# again when they are reused
+class ConversionCache:
+    def __init__(self):
+        self.db: Optional[SqliteDatabase] = None
+        self.fingerprint: bytes = b""  # Hash of the configuration & version
+        self.run: int = 0  # Number of this run, the last use of touched conversions
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evicted: int = 0
+        self.touched: set[str] = set()  # Keys of the conversions used by this run
+        self.new: dict[str, Cached] = {}  # Conversions made by this run
+
+    @property
+    def enabled(self) -> bool:
+        return self.db is not None
+
+    # Open the cache at path, creating it if needed
+    def open(self, path: str) -> None:
+        try:
+            spip2md_version: str = version(NAME)
+        except PackageNotFoundError:
+            spip2md_version = "unknown"
+        fingerprint = sha256(spip2md_version.encode())
+        for option in CACHE_OPTIONS:
+            fingerprint.update(f"\0{option}={getattr(CFG, option)!r}".encode())
+        # Any change of the code can change conversions, even if version is the same
+        for source in sorted(listdir(dirname(__file__))):
+            if source.endswith(".py"):
+                with open(join(dirname(__file__), source), "rb") as f:
+                    fingerprint.update(f.read())
+        self.fingerprint = fingerprint.digest()
+        self.db = SqliteDatabase(
+            expanduser(path), pragmas={"journal_mode": "wal", "synchronous": "off"}
+        )
+        self.db.connect()
+        columns: tuple[str, ...] = tuple(
+            column[1]
+            for column in self.db.execute_sql(f'PRAGMA table_info("{CACHE_TABLE}")')
+        )
+        if len(columns) > 0 and columns != CACHE_COLUMNS:
+            LOG.info(f"Drop conversions cache {path} made by another spip2md version")
+            self.db.execute_sql(f'DROP TABLE "{CACHE_TABLE}"')
+        self.db.execute_sql(
+            f'CREATE TABLE IF NOT EXISTS "{CACHE_TABLE}" ("key" TEXT PRIMARY KEY,'
+            + ' "output" TEXT, "repairs" TEXT, "size" INTEGER, "used" INTEGER)'
+        )
+        self.db.execute_sql(
+            f'CREATE INDEX IF NOT EXISTS "{CACHE_TABLE}_used" ON "{CACHE_TABLE}"'
+            + ' ("used")'
+        )
+        (last,) = self.db.execute_sql(
+            f'SELECT MAX("used") FROM "{CACHE_TABLE}"'
+        ).fetchone()
+        self.run = (last or 0) + 1
+        LOG.debug(f"Opened conversions cache {path} for run {self.run}")
+
+    # Key of the conversion of field with given parameters
+    def key(self, field: str, *params: object) -> str:
+        key = sha256(self.fingerprint)
+        key.update(repr(params).encode())
+        key.update(field.encode(errors="surrogatepass"))
+        return key.hexdigest()
+
+    # Get the cached output of the conversion of key & the broken encodings it
+    # repaired, None if it’s not cached
+    def get(self, key: str) -> Optional[Cached]:
+        output: Optional[Cached] = self.new.get(key)
+        if output is None and self.db is not None:
+            row = self.db.execute_sql(
+                f'SELECT "output", "repairs" FROM "{CACHE_TABLE}" WHERE "key" = ?',
+                (key,),
+            ).fetchone()
+            if row is not None:
+                output = (row[0], json.loads(row[1]))
+                self.touched.add(key)
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    # Store the output of the conversion of key & the broken encodings it repaired,
+    # written by batches
+    def put(self, key: str, output: str, repairs: dict[str, int]) -> None:
+        self.new[key] = (output, repairs)
+        if len(self.new) >= CACHE_BATCH:
+            self.flush()
+
+    # Write the conversions made & mark the conversions used by this run
+    def flush(self) -> None:
+        if self.db is None:
+            return
+        with self.db.atomic():
+            touched: list[str] = list(self.touched)
+            for i in range(0, len(touched), CACHE_BATCH):
+                batch = touched[i : i + CACHE_BATCH]
+                self.db.execute_sql(
+                    f'UPDATE "{CACHE_TABLE}" SET "used" = ? WHERE "key" IN'
+                    + f" ({', '.join('?' for _ in batch)})",
+                    (self.run, *batch),
+                )
+            self.db.cursor().executemany(
+                f'INSERT OR REPLACE INTO "{CACHE_TABLE}" VALUES (?, ?, ?, ?, ?)',
+                (
+                    (
+                        key,
+                        output,
+                        json.dumps(repairs, ensure_ascii=False),
+                        len(output.encode(errors="surrogatepass")),
+                        self.run,
+                    )
+                    for key, (output, repairs) in self.new.items()
+                ),
+            )
+        self.touched, self.new = set(), {}
+
+    # Write the cache, evict least recently used conversions until it’s at most
+    # max_size bytes, and close it
+    def close(self, max_size: int) -> None:
+        if self.db is None:
+            return
+        self.flush()
+        with self.db.atomic():
+            (size,) = self.db.execute_sql(
+                f'SELECT COALESCE(SUM("size"), 0) FROM "{CACHE_TABLE}"'
+            ).fetchone()
+            evicted: list[str] = []
+            if size > max_size:
+                for key, key_size in self.db.execute_sql(
+                    f'SELECT "key", "size" FROM "{CACHE_TABLE}" ORDER BY "used"'
+                ).fetchall():
+                    if size <= max_size:
+                        break
+                    evicted.append(key)
+                    size -= key_size
+            for i in range(0, len(evicted), CACHE_BATCH):
+                batch = evicted[i : i + CACHE_BATCH]
+                self.db.execute_sql(
+                    f'DELETE FROM "{CACHE_TABLE}" WHERE "key" IN'
+                    + f" ({', '.join('?' for _ in batch)})",
+                    tuple(batch),
+                )
+            self.evicted = len(evicted)
+        self.db.close()
+        self.db = None
+
+    # Print the hits & misses of the cache
+    def report(self) -> None:
+        lookups: int = self.hits + self.misses
+        rate: float = 100 * self.hits / lookups if lookups > 0 else 0
+        print(
+            f"Conversions cache: {esc(BOLD)}{self.hits}{esc()} hits,"
+            + f" {esc(BOLD)}{self.misses}{esc()} misses ({rate:.0f}% hits),"
+            + f" {esc(BOLD)}{self.evicted}{esc()} evicted"
+        )
+
+
+# Global conversions cache, only opened if CFG.conversion_cache
+CONVERSIONS = ConversionCache()
@@ -21,6 +21,7 @@ from typing import Optional
 from yaml import Loader, load
 
 NAME: str = "spip2md"  # Name of program, notably used in logs
+COMMANDS: tuple[str, ...] = ("snapshot",)  # CLI args that aren’t configuration files
 
 
 # Searches for a configuration file from all CLI args and in standard locations
@@ -28,7 +29,8 @@ NAME: str = "spip2md"  # Name of program, notably used in logs
 def config(*start_locations: str) -> Optional[str]:
     # Search for config files in CLI arguments and function params first
     argv = __import__("sys").argv
-    config_locations: list[str] = argv[1:] + list(start_locations)
+    config_locations: list[str] = [arg for arg in argv[1:] if arg not in COMMANDS]
+    config_locations += list(start_locations)
 
     if "XDG_CONFIG_HOME" in environ:
         config_locations += [
@@ -57,12 +59,22 @@ def config(*start_locations: str) -> Optional[str]:
 
 # Global configuration object
 class Configuration:
-    db: str = "spip"  # DB name
+    db_type: str = "mysql"  # Data source: mysql, sqlite, dump file or local snapshot
+    db: str = "spip"  # DB name, or path of its file
+    dump_encoding: str = "utf-8"  # Encoding of the dump file, as set by its charset
     db_host: str = "localhost"  # Where is the DB
     db_user: str = "spip"  # A DB user with read access to SPIP database
     db_pass: str = "password"  # Password of db_user
+    db_max_connections: int = 1  # Connections to MySQL that can be open at once
+    db_stale_timeout: int = 300  # Seconds after which an idle connection is closed
+    db_consistent_snapshot: bool = False  # Read MySQL as it was at connection
+    db_snapshot: str = "spip2md-snapshot.sqlite"  # Local copy of the DB tables
     data_dir: str = "IMG/"  # The directory in which SPIP images & documents are stored
+    preload: bool = False  # Load needed tables in memory with few bulk queries
+    fetch_batch_size: int = 0  # If > 0, fetch children by batches of this many rows
+    defer_text_columns: bool = False  # Read long texts of listed objects when used
     export_languages = ("fr", "en")  # Languages that will be exported
+    single_traversal: bool = False  # Export all languages in one walk of the tree
     storage_language: Optional[str] = "fr"  # Language of files and directories names
     output_dir: str = "output/"  # The directory to which DB will be exported
     prepend_h1: bool = False  # Add the title of the article as a Markdown h1
@@ -75,15 +87,27 @@ class Configuration:
     ignore_taxonomies = ("Gestion du site", "Gestion des articles", "Mise en page")
     rename_taxonomies: dict[str, str] = {"equipes": "tag-equipes"}
     metadata_markup: bool = False  # Should spip2md keep the markup in metadata fields
+    markup_engine: str = "regex"  # SPIP markup conversion: regex or tokenizer
+    conversion_cache: Optional[str] = None  # SQLite file caching conversions
+    conversion_cache_size: int = 512  # Maximum size of conversions cache, in MB
+    workers: int = 0  # If > 1, convert objects ahead in this many processes
     title_max_length: int = 40  # Maximum length of a single title for directory names
     unknown_char_replacement: str = "??"  # Replaces unknown characters
     clear_log: bool = True  # Clear log before every run instead of appending to
     clear_output: bool = True  # Remove eventual output dir before running
+    write_changed_only: bool = False  # Don’t rewrite files that didn’t change
+    deduplicate_documents: Optional[str] = None  # Link same documents: hardlink/symlink
+    copy_strategy: str = "copy"  # Put files in output: copy, reflink, hardlink, symlink
+    writer_threads: int = 0  # If > 0, write files in background in this many threads
+    writer_queue_size: int = 64  # Files waiting to be written before export waits
+    incremental: bool = False  # Only export again what changed since last export
+    manifest: str = "spip2md-manifest.json"  # Record of the last incremental export
     ignore_patterns: list[str] = []  # Ignore objects of which title match
     logfile: str = "log-spip2md.log"  # File where logs will be written, relative to wd
     loglevel: str = "WARNING"  # Minimum criticity of logs written in logfile
     export_filetype: str = "md"  # Extension of exported text files
     debug_meta: bool = False  # Include more metadata from SPIP DB in frontmatters
+    profile_queries: int = 0  # If > 0, print this many most costly DB query shapes
 
     def __init__(self, config_file: Optional[str] = None):
         if config_file is not None:
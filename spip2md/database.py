@@ -0,0 +1,254 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from atexit import register
+from os import close, remove
+from os.path import expanduser, isfile
+from re import I, match
+from tempfile import mkstemp
+from typing import Any, Optional
+
+from peewee import (
+    AutoField,
+    CompositeKey,
+    Field,
+    FloatField,
+    IntegerField,
+    Model,
+    SqliteDatabase,
+    __exception_wrapper__,
+)
+from playhouse.pool import PooledMySQLDatabase
+
+from spip2md.config import CFG, NAME
+from spip2md.mysqldump import DumpReader
+from spip2md.spip_models import (
+    DB,
+    SpipArticles,
+    SpipAuteurs,
+    SpipAuteursLiens,
+    SpipDocuments,
+    SpipDocumentsLiens,
+    SpipMots,
+    SpipMotsLiens,
+    SpipRubriques,
+)
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".database")
+
+# Tables that are read to export a SPIP site
+SOURCE_MODELS: tuple[type[Model], ...] = (
+    SpipRubriques,
+    SpipArticles,
+    SpipDocuments,
+    SpipDocumentsLiens,
+    SpipAuteurs,
+    SpipAuteursLiens,
+    SpipMots,
+    SpipMotsLiens,
+)
+
+# Columns on which children & linked objects are searched
+SOURCE_INDEXES: tuple[tuple[type[Model], tuple[str, ...]], ...] = (
+    (SpipRubriques, ("id_parent",)),
+    (SpipArticles, ("id_rubrique",)),
+    (SpipDocumentsLiens, ("objet", "id_objet")),
+    (SpipAuteursLiens, ("objet", "id_objet")),
+    (SpipMotsLiens, ("objet", "id_objet")),
+)
+
+
+# Get the SQLite type of a field
+def sqlite_type(field: Field) -> str:
+    if isinstance(field, IntegerField):
+        return "INTEGER"
+    if isinstance(field, FloatField):
+        return "REAL"
+    return "TEXT"
+
+
+# Get the SQLite default value of a field, from its MySQL DEFAULT constraint
+def sqlite_default(field: Field) -> str:
+    for constraint in field.constraints or []:
+        default = match(r"DEFAULT (.*)", constraint.sql, I)
+        if default is not None:
+            # MySQL function that SQLite only knows as a keyword
+            if default.group(1).lower() == "current_timestamp()":
+                return "CURRENT_TIMESTAMP"
+            return default.group(1)
+    if field.null:
+        return "NULL"
+    # Implicit default value of MySQL NOT NULL columns
+    return "0" if isinstance(field, (IntegerField, FloatField)) else "''"
+
+
+# Create the tables of SOURCE_MODELS in a SQLite database, with their indexes
+def create_sqlite_tables(db: SqliteDatabase) -> None:
+    for model in SOURCE_MODELS:
+        columns: list[str] = []
+        for field in model._meta.sorted_fields:
+            if isinstance(field, AutoField):
+                columns.append(f'"{field.column_name}" INTEGER PRIMARY KEY')
+            else:
+                columns.append(
+                    f'"{field.column_name}" {sqlite_type(field)}'
+                    + f" DEFAULT {sqlite_default(field)}"
+                )
+        if isinstance(model._meta.primary_key, CompositeKey):
+            key: str = ", ".join(
+                f'"{model._meta.fields[name].column_name}"'
+                for name in model._meta.primary_key.field_names
+            )
+            columns.append(f"PRIMARY KEY ({key})")
+        db.execute_sql(
+            f'CREATE TABLE IF NOT EXISTS "{model._meta.table_name}"'
+            + f" ({', '.join(columns)})"
+        )
+    for model, index in SOURCE_INDEXES:
+        table: str = model._meta.table_name
+        db.execute_sql(
+            f'CREATE INDEX IF NOT EXISTS "{table}_{"_".join(index)}"'
+            + f""" ON "{table}" ({", ".join(f'"{c}"' for c in index)})"""
+        )
+
+
+# Database file of a SPIP site running on SQLite, opened read-only. Its tables are
+# shadowed by temporary views giving every column the models expect, so that columns
+# that this SPIP version doesn’t have take their MySQL default value
+class SpipSqliteDatabase(SqliteDatabase):
+    def __init__(self, path: str, **kwargs: Any):
+        self.path: str = expanduser(path)
+        super().__init__(f"file:{self.path}?mode=ro", uri=True, **kwargs)
+
+    def _initialize_connection(self, conn: Any) -> None:
+        super()._initialize_connection(conn)
+        for model in SOURCE_MODELS:
+            table: str = model._meta.table_name
+            existing: set[str] = {
+                column[1]
+                for column in conn.execute(f'PRAGMA main.table_info("{table}")')
+            }
+            if len(existing) == 0:
+                LOG.warning(f"No {table} table in {self.path}, considered empty")
+            columns: list[str] = []
+            for field in model._meta.sorted_fields:
+                if field.column_name in existing:
+                    columns.append(f'"{field.column_name}"')
+                else:
+                    LOG.debug(f"No {table}.{field.column_name} column, use default")
+                    columns.append(f'{sqlite_default(field)} AS "{field.column_name}"')
+            source: str = f' FROM main."{table}"' if len(existing) > 0 else " WHERE 0"
+            conn.execute(
+                f'CREATE TEMP VIEW IF NOT EXISTS "{table}"'
+                + f" AS SELECT {', '.join(columns)}{source}"
+            )
+
+
+# MySQL database of which connections are kept in a pool, so that each thread reading
+# the database gets its own connection, returned to the pool when the thread closes it
+class SpipMySQLDatabase(PooledMySQLDatabase):
+    # If CFG.db_consistent_snapshot, every query of a connection reads the database
+    # as it was when the connection was opened, even if the site is being modified
+    def _initialize_connection(self, conn: Any) -> None:
+        super()._initialize_connection(conn)
+        if CFG.db_consistent_snapshot:
+            LOG.debug(f"Start a consistent snapshot transaction on connection {conn}")
+            with conn.cursor() as cursor:
+                self.start_snapshot(cursor)
+
+    # Transactions, like the one of `with DB:`, read a consistent snapshot too, as a
+    # plain BEGIN would commit the one started with the connection
+    def begin(self, isolation_level: Optional[str] = None) -> None:
+        if not CFG.db_consistent_snapshot:
+            super().begin(isolation_level)
+            return
+        LOG.debug("Start a consistent snapshot transaction")
+        with __exception_wrapper__:
+            self.start_snapshot(self.cursor())
+
+    # Start a read-only transaction reading the database as it is now
+    @staticmethod
+    def start_snapshot(cursor: Any) -> None:
+        # The isolation level applies to the next transaction only
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+
+
+# Copy the rows of SOURCE_MODELS tables of a mysqldump file into a temporary SQLite
+# database, streaming them so that the dump is never entirely held in memory
+def import_dump(dump_path: str) -> str:
+    descriptor, sqlite_path = mkstemp(prefix=NAME + "-", suffix=".sqlite")
+    close(descriptor)
+    register(remove, sqlite_path)  # Remove the temporary database at exit
+    LOG.info(f"Import tables of dump {dump_path} into {sqlite_path}")
+    db = SqliteDatabase(sqlite_path, pragmas={"journal_mode": "off"})
+    models: dict[str, type[Model]] = {m._meta.table_name: m for m in SOURCE_MODELS}
+    reader = DumpReader(dump_path, tuple(models), CFG.dump_encoding)
+    counter: dict[str, int] = {}
+    with db:
+        create_sqlite_tables(db)
+        for table, columns, rows in reader.read():
+            known: set[str] = {f.column_name for f in models[table]._meta.sorted_fields}
+            # Ignore columns that models don’t know of
+            kept: list[int] = [i for i, c in enumerate(columns) if c in known]
+            db.cursor().executemany(
+                f'INSERT OR REPLACE INTO "{table}"'
+                + f""" ({", ".join(f'"{columns[i]}"' for i in kept)})"""
+                + f" VALUES ({', '.join('?' for _ in kept)})",
+                (tuple(row[i] for i in kept) for row in rows),
+            )
+            counter[table] = counter.get(table, 0) + len(rows)
+    LOG.info(f"Imported rows of dump {dump_path}: {counter}")
+    return sqlite_path
+
+
+# Human readable name of the data source
+def source_name() -> str:
+    if CFG.db_type == "mysql":
+        return f"{CFG.db}@{CFG.db_host}"
+    if CFG.db_type == "snapshot":
+        return CFG.db_snapshot
+    return CFG.db
+
+
+# Initialize the database with settings from CFG
+def init_database() -> None:
+    if CFG.db_type == "dump":
+        DB.initialize(SqliteDatabase(import_dump(CFG.db)))
+    elif CFG.db_type == "sqlite":
+        DB.initialize(SpipSqliteDatabase(CFG.db))
+    elif CFG.db_type == "snapshot":
+        if not isfile(expanduser(CFG.db_snapshot)):
+            raise FileNotFoundError(
+                f"No snapshot at {CFG.db_snapshot}, make it with `{NAME} snapshot`"
+            )
+        DB.initialize(SqliteDatabase(expanduser(CFG.db_snapshot)))
+    elif CFG.db_type == "mysql":
+        DB.initialize(
+            SpipMySQLDatabase(
+                CFG.db,
+                max_connections=CFG.db_max_connections,
+                stale_timeout=CFG.db_stale_timeout,
+                host=CFG.db_host,
+                user=CFG.db_user,
+                password=CFG.db_pass,
+            )
+        )
+    else:
+        raise ValueError(
+            f"Unknown db_type {CFG.db_type}, use mysql, sqlite, dump or snapshot"
+        )
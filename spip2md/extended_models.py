@@ -14,36 +14,55 @@ You should have received a copy of the GNU General Public License along with spi
 If not, see <https://www.gnu.org/licenses/>.
 """
 import logging
-from os import listdir, mkdir
-from os.path import basename, isfile, splitext
-from re import I, Match, Pattern, finditer, match, search
+from copy import copy
+from hashlib import sha256
+from itertools import islice
+from os import mkdir
+from os.path import basename, getmtime, getsize, isfile, relpath, splitext
+from re import I, Match, Pattern, match
 from re import error as re_error
-from shutil import copyfile
-from typing import Any, Optional
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Optional
 
 from peewee import (
     BigAutoField,
     BigIntegerField,
     DateTimeField,
     DoesNotExist,
+    Field,
+    FieldAccessor,
+    Model,
+    ModelSelect,
 )
 from slugify import slugify
 from yaml import dump
 
+from spip2md.cache import CONVERSIONS, Cached
 from spip2md.config import CFG, NAME
+from spip2md.manifest import MANIFEST
+from spip2md.output import OUTPUT
+from spip2md.parallel import POOL
+from spip2md.preload import PRELOAD
 from spip2md.regexmaps import (
     ARTICLE_LINK,
     BLOAT,
-    CONFIG_LANGS,
     DOCUMENT_LINK,
     HTMLTAGS,
     IMAGE_LINK,
     ISO_UTF,
+    ISO_UTF_ASCII,
+    ISO_UTF_CHAINING,
+    ISO_UTF_PATTERN,
+    ISO_UTF_REPAIRS,
+    LINK_TARGET,
+    LINK_TARGET_OBJETS,
     MULTILANG_BLOCK,
+    MULTILANG_MARKER,
+    MULTILANG_TEXT,
     SECTION_LINK,
     SPECIAL_OUTPUT,
     SPIP_MARKDOWN,
-    UNKNOWN_ISO,
+    UNKNOWN_ISO_PATTERN,
     WARNING_OUTPUT,
 )
 from spip2md.spip_models import (
@@ -57,6 +76,7 @@ from spip2md.spip_models import (
     SpipRubriques,
 )
 from spip2md.style import BOLD, CYAN, GREEN, WARNING_STYLE, YELLOW, esc
+from spip2md.tokenizer import convert as tokenize
 
 DeepDict = dict[str, "list[DeepDict] | list[str] | str"]
 
@@ -66,6 +86,16 @@ LOG = logging.getLogger(NAME + ".models")
 # Define type that images can have
 IMG_TYPES = ("jpg", "png", "jpeg", "gif", "webp", "ico")
 
+# Number of repairs of each non ASCII broken encoding, for all exported objects
+REPAIRS: dict[str, int] = {}
+
+# Number of fields to which each conversion step is applied at once by convert_fields
+CONVERSION_BATCH = 256
+
+# A converted field, with the number of each broken encoding repaired in it and the
+# warnings about it
+Conversion = tuple[str, dict[str, int], list[str]]
+
 
 class SpipWritable:
     # From SPIP database
@@ -85,6 +115,9 @@ class SpipWritable:
     _storage_parentdir: str  # Path from output dir to direct parent
     _style: tuple[int, ...]  # _styles to apply to some elements of printed output
     _storage_title_append: int = 0  # Append a number to storage title if > 0
+    _objet: str  # Name of this type of object in SPIP *_liens tables
+    # Conversions of fields by (field, keep_markup), when they’re made ahead
+    _converted: Optional[dict[tuple[str, bool], Conversion]] = None
 
     # Apply a mapping from regex maps
     @staticmethod
@@ -111,34 +144,159 @@ class SpipWritable:
                     text = text.replace(old, "")
         return text
 
-    # Warn about unknown chars & replace them with config defined replacement
-    def warn_unknown(self, text: str, unknown_mapping: tuple) -> str:
-        # Return unknown char surrounded by context_length chars
-        def unknown_chars_context(text: str, char: str, context_len: int = 24) -> str:
-            context: str = r".{0," + str(context_len) + r"}"
-            m = search(
-                context + r"(?=" + char + r")" + char + context,
-                text,
-            )
-            if m is not None:
-                return m.group()
-            else:
-                return char
-
-        for char in unknown_mapping:
-            lastend: int = 0
-            for m in finditer("(" + char + ")+", text):
-                context: str = unknown_chars_context(text[lastend:], char)
-                LOG.warn(
-                    f"Unknown char {char} found in {self.titre[:40]} at: {context}"
+    # Repair every broken encoding of text in a single scan, counting the repairs in
+    # counter, or in REPAIRS if it’s None
+    def repair_encoding(
+        self, text: str, counter: Optional[dict[str, int]] = None
+    ) -> str:
+        if text.isascii():  # Only the ASCII broken encodings can be found
+            return self.apply_mapping(text, ISO_UTF_ASCII)
+        repairs: dict[str, int] = {}
+        chaining: bool = False  # If a repair can form another broken encoding
+
+        def repair(m: Match[str]) -> str:
+            nonlocal chaining
+            broken: str = m.group()
+            if not broken.isascii():
+                repairs[broken] = repairs.get(broken, 0) + 1
+            chaining = chaining or ISO_UTF_REPAIRS[broken] in ISO_UTF_CHAINING
+            return ISO_UTF_REPAIRS[broken]
+
+        repaired: str = ISO_UTF_PATTERN.sub(repair, text)
+        # Rarely, repairs form another broken encoding, that ISO_UTF would repair too
+        if chaining and ISO_UTF_PATTERN.search(repaired) is not None:
+            repaired = self.apply_mapping(text, ISO_UTF)
+        if len(repairs) > 0:
+            if counter is None:
+                counter = REPAIRS
+            for broken, count in repairs.items():
+                counter[broken] = counter.get(broken, 0) + count
+            LOG.debug(
+                f"Repaired broken encoding in {self.titre[:40]}: "
+                + ", ".join(
+                    f"{b} -> {ISO_UTF_REPAIRS[b]} ({c})" for b, c in repairs.items()
                 )
-                if CFG.unknown_char_replacement is not None:
-                    LOG.warn(
-                        f"Replacing {m.group()} with {CFG.unknown_char_replacement}"
-                    )
-                    text = text.replace(m.group(), CFG.unknown_char_replacement, 1)
+            )
+        return repaired
+
+    # Warn once about all unknown chars & replace them with configured replacement,
+    # appending the warning to warnings instead of logging it if it’s not None
+    def warn_unknown(
+        self,
+        text: str,
+        unknown: Pattern[str],
+        context_len: int = 24,
+        warnings: Optional[list[str]] = None,
+    ) -> str:
+        contexts: list[str] = []
+        pieces: list[str] = []  # Pieces of the text with unknown chars replaced
+        lastend: int = 0
+        for m in unknown.finditer(text):
+            # Unknown chars surrounded by up to context_len chars of their line
+            before: str = text[max(0, m.start() - context_len) : m.start()]
+            after: str = text[m.end() : m.end() + context_len]
+            contexts.append(
+                before.rsplit("\n", 1)[-1] + m.group() + after.split("\n", 1)[0]
+            )
+            if CFG.unknown_char_replacement is not None:
+                pieces += (text[lastend : m.start()], CFG.unknown_char_replacement)
                 lastend = m.end()
-        return text
+        if len(contexts) == 0:
+            return text
+        warning: str = (
+            f"Unknown chars found {len(contexts)} times in {self.titre[:40]}"
+            + (
+                f", replaced with {CFG.unknown_char_replacement}"
+                if CFG.unknown_char_replacement is not None
+                else ""
+            )
+            + ", at: "
+            + " | ".join(contexts)
+        )
+        if warnings is None:
+            LOG.warn(warning)
+        else:
+            warnings.append(warning)
+        if CFG.unknown_char_replacement is None:
+            return text
+        return "".join(pieces) + text[lastend:]
+
+    # Steps of the conversion of fields, by name, counting the broken encodings they
+    # repair in repairs & appending the warnings they issue to warnings
+    def conversion_steps(
+        self, keep_markup: bool, repairs: dict[str, int], warnings: list[str]
+    ) -> list[tuple[str, Callable[[str], str]]]:
+        steps: list[tuple[str, Callable[[str], str]]] = []
+        # Convert SPIP syntax to Markdown
+        if CFG.markup_engine == "tokenizer":
+            steps.append(("markup", lambda t: tokenize(t, keep_markup)))
+        else:
+            steps.append(
+                (
+                    "markup",
+                    lambda t: self.apply_mapping(t, SPIP_MARKDOWN, keep_markup),
+                )
+            )
+        # Remove useless text
+        steps.append(("bloat", lambda t: self.apply_mapping(t, BLOAT)))
+        # Convert broken ISO encoding to UTF
+        steps.append(("encoding", lambda t: self.repair_encoding(t, repairs)))
+        if CFG.remove_html:
+            # Delete remaining HTML tags in body WARNING
+            steps.append(("html", lambda t: self.apply_mapping(t, HTMLTAGS)))
+        # Warn about unknown chars
+        steps.append(
+            (
+                "unknown",
+                lambda t: self.warn_unknown(t, UNKNOWN_ISO_PATTERN, warnings=warnings),
+            )
+        )
+        steps.append(("strip", str.strip))  # Strip whitespaces around text
+        return steps
+
+    # Convert field, returning the converted field along with the broken encodings
+    # repaired & the warnings issued, without counting or logging them
+    def conversion(self, field: str, keep_markup: bool = True) -> Conversion:
+        repairs: dict[str, int] = {}
+        warnings: list[str] = []
+        for _, step in self.conversion_steps(keep_markup, repairs, warnings):
+            field = step(field)
+        return field, repairs, warnings
+
+    # Count the broken encodings repaired & log the warnings issued by conversions
+    @staticmethod
+    def count_conversion(repairs: dict[str, int], warnings: list[str]) -> None:
+        for broken, count in repairs.items():
+            REPAIRS[broken] = REPAIRS.get(broken, 0) + count
+        for warning in warnings:
+            LOG.warn(warning)
+
+    # Get the conversion of field made by a previous run or ahead by a worker, or
+    # None if there’s none, along with the key of field in conversions cache
+    def previous_conversion(
+        self, field: str, keep_markup: bool
+    ) -> tuple[Optional[str], Optional[str]]:
+        # Reuse the conversion of a previous run if the field didn’t change
+        key: Optional[str] = None
+        if CONVERSIONS.enabled:
+            key = CONVERSIONS.key(field, keep_markup)
+            cached: Optional[Cached] = CONVERSIONS.get(key)
+            if cached is not None:
+                output, repairs = cached
+                self.count_conversion(repairs, [])
+                return output, key
+        # Reuse the conversion made by a worker if it had the same field to convert
+        if self._converted is not None:
+            conversion: Optional[Conversion] = self._converted.get((field, keep_markup))
+            if conversion is not None:
+                POOL.hits += 1
+                output, repairs, warnings = conversion
+                self.count_conversion(repairs, warnings)
+                if key is not None:
+                    CONVERSIONS.put(key, output, repairs)
+                return output, key
+            POOL.misses += 1
+        return None, key
 
     # Apply needed methods on text fields
     def convert_field(self, field: Optional[str], keep_markup: bool = True) -> str:
@@ -146,24 +304,97 @@ class SpipWritable:
             return ""
         if len(field) == 0:
             return ""
-        # Convert SPIP syntax to Markdown
-        field = self.apply_mapping(field, SPIP_MARKDOWN, keep_markup)
-        # Remove useless text
-        field = self.apply_mapping(field, BLOAT)
-        # Convert broken ISO encoding to UTF
-        field = self.apply_mapping(field, ISO_UTF)
-        if CFG.remove_html:
-            # Delete remaining HTML tags in body WARNING
-            field = self.apply_mapping(field, HTMLTAGS)
-        # Warn about unknown chars
-        field = self.warn_unknown(field, UNKNOWN_ISO)
-        return field.strip()  # Strip whitespaces around text
+        output, key = self.previous_conversion(field, keep_markup)
+        if output is not None:
+            return output
+        conversion: Conversion = self.conversion(field, keep_markup)
+        if self._converted is not None:
+            self._converted[(field, keep_markup)] = conversion
+        output, repairs, warnings = conversion
+        self.count_conversion(repairs, warnings)
+        if key is not None:
+            CONVERSIONS.put(key, output, repairs)
+        return output
+
+    # Convert fields like convert_field, yielding them in order, but applying each
+    # step of the conversion to batch_size fields at a time. If timings isn’t None,
+    # the seconds spent in each step are added to it
+    def convert_fields(
+        self,
+        fields: Iterable[Optional[str]],
+        keep_markup: bool = True,
+        batch_size: int = CONVERSION_BATCH,
+        timings: Optional[dict[str, float]] = None,
+    ) -> Iterator[str]:
+        repairs: dict[str, int] = {}
+        warnings: list[str] = []
+        steps = self.conversion_steps(keep_markup, repairs, warnings)
+        iterator: Iterator[Optional[str]] = iter(fields)
+        while True:
+            batch: list[Optional[str]] = list(islice(iterator, batch_size))
+            if len(batch) == 0:
+                return
+            outputs: list[str] = [""] * len(batch)
+            keys: dict[int, Optional[str]] = {}  # Cache keys of fields to convert
+            # Broken encodings repaired & warnings issued by each field to convert
+            effects: dict[int, tuple[dict[str, int], list[str]]] = {}
+            for i, field in enumerate(batch):
+                if field is not None and len(field) > 0:
+                    output, key = self.previous_conversion(field, keep_markup)
+                    if output is not None:
+                        outputs[i] = output
+                    else:
+                        outputs[i] = field
+                        keys[i] = key
+                        effects[i] = ({}, [])
+            for name, step in steps:
+                start: float = perf_counter()
+                for i, (field_repairs, field_warnings) in effects.items():
+                    outputs[i] = step(outputs[i])
+                    for broken, count in repairs.items():
+                        field_repairs[broken] = field_repairs.get(broken, 0) + count
+                    field_warnings += warnings
+                    repairs.clear()
+                    warnings.clear()
+                if timings is not None:
+                    timings[name] = timings.get(name, 0) + perf_counter() - start
+            for i, (field_repairs, field_warnings) in effects.items():
+                if self._converted is not None:
+                    self._converted[(str(batch[i]), keep_markup)] = (
+                        outputs[i],
+                        field_repairs,
+                        field_warnings,
+                    )
+                self.count_conversion(field_repairs, field_warnings)
+                if keys[i] is not None:
+                    CONVERSIONS.put(str(keys[i]), outputs[i], field_repairs)
+            yield from outputs
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Initialize converted fields beginning with underscore
-        self._description: str = self.convert_field(self.descriptif)
         self._draft = self.statut != "publie"
+        # Fields converted on first access, shared with translations of this object
+        self._memoized: dict[str, str] = {}
+
+    # Convert field on first access of name, then return the same conversion to
+    # this object and its translations
+    def memoized(self, name: str, field: Optional[str]) -> str:
+        if name not in self._memoized:
+            self._memoized[name] = self.convert_field(field)
+        return self._memoized[name]
+
+    @property
+    def _description(self) -> str:
+        return self.memoized("_description", self.descriptif)
+
+    # Get a copy of this object with its own fields values, that can be converted to
+    # one language while sharing the language independent conversions of self
+    def translation(self):
+        obj = copy(self)
+        obj.__data__ = dict(self.__data__)
+        obj._dirty = set(self._dirty)
+        return obj
 
     # Apply post-init conversions and cancel the export if self not of the right lang
     def convert(self) -> None:
@@ -241,6 +472,14 @@ class SpipWritable:
         self.style_print(output + str(message), indent=None)
         return output + str(message)
 
+    # Output the error of a file of this object that failed to be written in background
+    def write_error(self, error: Exception) -> str:
+        title: str = (
+            self._storage_title if len(self._storage_title) > 0 else "EMPTY NAME"
+        )
+        self.style_print(title, end="")
+        return self.end_message(error)
+
     # Perform all the write steps of this object
     def write_all(
         self,
@@ -270,6 +509,7 @@ class SpipWritable:
 
 class Document(SpipWritable, SpipDocuments):
     _fileprefix: str = ""
+    _objet: str = "document"
     _style = (BOLD, CYAN)  # Documents accent color is blue
 
     class Meta:
@@ -302,8 +542,12 @@ class Document(SpipWritable, SpipDocuments):
 
     # Write document to output destination
     def write(self) -> str:
+        # Keep the copy of the previous export if the document didn’t change
+        if MANIFEST.enabled and MANIFEST.copied(self.dest_path(), str(self.maj)):
+            OUTPUT.store(self.src_path(), self.dest_path())
+            return self.dest_path()
         # Copy the document from it’s SPIP location to the new location
-        return copyfile(self.src_path(), self.dest_path())
+        return OUTPUT.copy_document(self.src_path(), self.dest_path(), self.write_error)
 
     # Perform all the write steps of this object
     def write_all(
@@ -326,6 +570,22 @@ class Document(SpipWritable, SpipDocuments):
             parentdepth, storage_parentdir, index, total, parenturl
         )
 
+    # Perform all the write steps of this object once for every parent translation,
+    # parents being (depth, directory, url) of each of them by language
+    def write_translations(
+        self,
+        parents: dict[str, tuple[int, str, str]],
+        indexes: dict[str, int],
+        total: int,
+    ) -> dict[str, str]:
+        self.convert()  # Documents conversions don’t depend on language
+        return {
+            lang: SpipWritable.write_all(
+                self, parentdepth, parentdir, indexes[lang], total, parenturl
+            )
+            for lang, (parentdepth, parentdir, parenturl) in parents.items()
+        }
+
 
 class IgnoredPatternError(Exception):
     pass
@@ -343,6 +603,13 @@ class DontExportEmptyError(Exception):
     pass
 
 
+# Errors cancelling the export of an object before it’s written, by name
+CANCELLING_ERRORS: dict[str, type[Exception]] = {
+    error.__name__: error
+    for error in (LangNotFoundError, DontExportDraftError, IgnoredPatternError)
+}
+
+
 class SpipRedactional(SpipWritable):
     id_trad: BigIntegerField | BigAutoField | int
     id_rubrique: BigAutoField | int
@@ -355,66 +622,78 @@ class SpipRedactional(SpipWritable):
     # Converted
     _text: str
     _taxonomies: dict[str, list[str]] = {}
-    _url_title: str  # Title in metadata of articles
+    _url_title: str = ""  # Title in metadata of articles
     _parenturl: str  # URL relative to lang to direct parent
     _static_img_path: Optional[str] = None  # Path to the static img of this article
+    # Key in manifest & hash of what the export depends on, if incremental
+    _manifest: Optional[tuple[str, str]] = None
+    _unchanged: bool = False  # If the file of the previous export is kept
+
+    # Split text into its pieces outside <multi> blocks, and its <multi> blocks as
+    # (text inside the block, its translations by lowercase lang)
+    @staticmethod
+    def split_multi(text: str) -> list[str | tuple[str, dict[str, str]]]:
+        pieces: list[str | tuple[str, dict[str, str]]] = []
+        lastend: int = 0
+        for block in MULTILANG_BLOCK.finditer(text):
+            translations: dict[str, str] = {}
+            # Each lang is translated by the text after its first usable marker
+            for marker in MULTILANG_MARKER.finditer(block.group(1)):
+                lang: str = marker.group(1).lower()
+                if lang not in translations:
+                    trans = MULTILANG_TEXT.match(block.group(1), marker.end())
+                    if trans is not None:
+                        translations[lang] = trans.group(1)
+            pieces += (text[lastend : block.start()], (block.group(1), translations))
+            lastend = block.end()
+        pieces.append(text[lastend:])
+        return pieces
 
     # Get rid of other lang than forced in text and modify lang to forced if found
     def translate_multi(
         self, forced_lang: str, text: str, change_lang: bool = True
     ) -> str:
         # LOG.debug(f"Translating <multi> blocks of `{self._url_title}`")
-        # for each <multi> blocks, keep only forced lang
-        lang: Optional[Match[str]] = None
-        for block in MULTILANG_BLOCK.finditer(text):
-            lang = CONFIG_LANGS[forced_lang].search(block.group(1))
-            if lang is not None:
+        # Split the <multi> blocks of text once for every language
+        if text not in self._multi:
+            self._multi[text] = self.split_multi(text)
+        output: list[str] = []
+        found: bool = False  # If forced_lang is found in the last block
+        for piece in self._multi[text]:
+            if type(piece) == str:
+                output.append(piece)
+                continue
+            block, translations = piece
+            found = forced_lang.lower() in translations
+            if found:
+                trans: str = translations[forced_lang.lower()]
                 # Log the translation
-                trans: str = lang.group(1)[:50].strip()
                 LOG.debug(
                     f"Keeping {forced_lang} translation of `{self._url_title}`: "
-                    + f"`{trans}`"
+                    + f"`{trans[:50].strip()}`"
                 )
                 if change_lang:
                     self.lang = forced_lang  # So write-all will not be cancelled
                 # Replace the mutli blocks with the text in the proper lang
-                text = text.replace(block.group(), lang.group(1))
+                output.append(trans)
             else:
                 # Replace the mutli blocks with the text inside
-                text = text.replace(block.group(), block.group(1))
-        if lang is None:
+                output.append(block)
+        if not found:
             LOG.debug(f"{forced_lang} not found in `{self._url_title}`")
-        return text
+        return "".join(output)
 
-    def replace_links(self, text: str) -> str:
+    # Replace the internal links of text, warning about the ones without target if warn
+    def replace_links(self, text: str, warn: bool = True) -> str:
         class LinkMappings:
             _link_types = IMAGE_LINK, DOCUMENT_LINK, SECTION_LINK, ARTICLE_LINK
+            _objets = "document", "document", "rubrique", "article"
 
             def __iter__(self):
                 self._type_cursor = 0
                 self._link_cursor = -1
                 return self
 
-            @staticmethod
-            def getdocument(obj_id: int) -> Document:
-                doc: Document = Document.get(Document.id_document == obj_id)
-                doc.convert()
-                return doc
-
-            @staticmethod
-            def getsection(obj_id: int) -> Section:
-                sec: Section = Section.get(Section.id_rubrique == obj_id)
-                sec.convert(self.lang)
-                return sec
-
-            @staticmethod
-            def getarticle(obj_id: int) -> Article:
-                art: Article = Article.get(Article.id_article == obj_id)
-                art.convert(self.lang)
-                return art
-
-            _obj_getters = getdocument, getdocument, getsection, getarticle
-
             def __next__(self):
                 self._link_cursor += 1
                 # If we reach end of current link type, pass to the beginning of next
@@ -427,33 +706,30 @@ class SpipRedactional(SpipWritable):
 
                 return (
                     self._link_types[self._type_cursor][self._link_cursor],
-                    self._obj_getters[self._type_cursor],
+                    self._objets[self._type_cursor],
                     "!" if self._type_cursor == 0 else "",
                 )
 
-        for link, getobj, prepend in LinkMappings():
+        for link, objet, prepend in LinkMappings():
             # LOG.debug(f"Looking for {link} in {text}")
             for m in link.finditer(text):
                 LOG.debug(f"Found internal link {m.group()} in {self._url_title}")
-                try:
-                    LOG.debug(
-                        f"Searching for object of id {m.group(2)} with "
-                        + getobj.__name__
-                    )
-                    o: "Document | Article | Section" = getobj(int(m.group(2)))
-                    # TODO get full relative path for sections and articles
-                    # TODO rewrite links markup (bold/italic) after stripping
-                    if len(m.group(1)) > 0:
-                        repl = f"{prepend}[{m.group(1)}]({o.dest_filename()})"
-                    else:
-                        repl = f"{prepend}[{o._storage_title}]({o.dest_filename()})"
-                    LOG.debug(
-                        f"Translate link {m.group()} to {repl} in {self._url_title}"
-                    )
-                    text = text.replace(m.group(), repl)
-                except DoesNotExist:
-                    LOG.warn(f"No object for link {m.group()} in {self._url_title}")
+                target: Optional[tuple[str, str]] = LINKS.target(
+                    objet, int(m.group(2)), self
+                )
+                if target is None:
+                    if warn:
+                        LOG.warn(f"No object for link {m.group()} in {self._url_title}")
                     text = text.replace(m.group(), prepend + "[](NOT FOUND)", 1)
+                    continue
+                title, path = target
+                # TODO rewrite links markup (bold/italic) after stripping
+                if len(m.group(1)) > 0:
+                    repl = f"{prepend}[{m.group(1)}]({path})"
+                else:
+                    repl = f"{prepend}[{title}]({path})"
+                LOG.debug(f"Translate link {m.group()} to {repl} in {self._url_title}")
+                text = text.replace(m.group(), repl)
         return text
 
     # Get this object url, or none if it’s the same as directory
@@ -569,36 +845,36 @@ class SpipRedactional(SpipWritable):
             self._extra = ""
             return
         LOG.debug(f"Convert internal links of {self.lang} `{self._url_title}` extra")
-        self._extra = self.replace_links(self._extra)
+        self._extra = self.replace_links(self.extra)
         LOG.debug(f"Apply conversions to {self.lang} `{self._url_title}` extra")
         self._extra = self.convert_field(self._extra, CFG.metadata_markup)
 
     def convert_taxonomies(self, forcedlang: str) -> None:
         self._taxonomies = {}
+        # Names & translated texts of taxonomies, converted all at once
+        names: list[str] = []
+        texts: list[str] = []
 
         for tag in self.taxonomies():
             taxonomy = str(tag.type)
             if taxonomy not in CFG.ignore_taxonomies:
                 LOG.debug(
-                    f"Translate taxonomy of `{self._url_title}`: {tag.descriptif}"
+                    f"Translate taxonomy of `{self._url_title}`: {tag.descriptif}"
                 )
                 if taxonomy in CFG.rename_taxonomies:
                     LOG.debug(
-                        f"Rename taxonomy {taxonomy}: {CFG.rename_taxonomies[taxonomy]}"
+                        f"Rename taxonomy {taxonomy}: {CFG.rename_taxonomies[taxonomy]}"
                     )
                     taxonomy = CFG.rename_taxonomies[taxonomy]
-                if str(taxonomy) in self._taxonomies:
-                    self._taxonomies[taxonomy].append(
-                        self.convert_field(
-                            self.translate_multi(forcedlang, str(tag.descriptif), False)
-                        )
-                    )
-                else:
-                    self._taxonomies[taxonomy] = [
-                        self.convert_field(
-                            self.translate_multi(forcedlang, str(tag.descriptif), False)
-                        )
-                    ]
+                names.append(taxonomy)
+                texts.append(
+                    self.translate_multi(forcedlang, str(tag.descriptif), False)
+                )
+        for taxonomy, text in zip(names, self.convert_fields(texts)):
+            if taxonomy in self._taxonomies:
+                self._taxonomies[taxonomy].append(text)
+            else:
+                self._taxonomies[taxonomy] = [text]
 
         LOG.debug(
             f"After translation, taxonomies of `{self._url_title}`: {self._taxonomies}"
@@ -608,18 +884,35 @@ class SpipRedactional(SpipWritable):
         super().__init__(*args, **kwargs)
         # Initialize converted fields, beginning with underscore
         self._choosen_language = self.langue_choisie == "oui"
+        # Related objects once fetched, shared with translations of this object
+        self._relations: dict[str, tuple[Any, ...]] = {}
+        # Fields split by split_multi, shared with translations of this object
+        self._multi: dict[str, list[str | tuple[str, dict[str, str]]]] = {}
 
     # Get related documents
     def documents(self) -> tuple[Document]:
+        if "documents" in self._relations:
+            return self._relations["documents"]
         LOG.debug(f"Initialize documents of `{self._url_title}`")
-        documents = (
-            Document.select()
-            .join(
-                SpipDocumentsLiens,
-                on=(Document.id_document == SpipDocumentsLiens.id_document),
+        if PRELOAD.loaded:
+            documents = tuple(
+                Document(**row)
+                for row in PRELOAD.linked_documents.get((self._objet, self._id), ())
             )
-            .where(SpipDocumentsLiens.id_objet == self._id)
-        )
+        else:
+            documents = tuple(
+                Document.select()
+                .join(
+                    SpipDocumentsLiens,
+                    on=(Document.id_document == SpipDocumentsLiens.id_document),
+                )
+                .where(
+                    (SpipDocumentsLiens.id_objet == self._id)
+                    & (SpipDocumentsLiens.objet == self._objet)
+                )
+                .order_by(Document.id_document)
+            )
+        self._relations["documents"] = documents
         return documents
 
     # Get the YAML frontmatter string
@@ -668,26 +961,119 @@ class SpipRedactional(SpipWritable):
         return body
 
     def authors(self) -> tuple[SpipAuteurs, ...]:
+        if "authors" in self._relations:
+            return self._relations["authors"]
         LOG.debug(f"Initialize authors of `{self._url_title}`")
-        return (
-            SpipAuteurs.select()
-            .join(
-                SpipAuteursLiens,
-                on=(SpipAuteurs.id_auteur == SpipAuteursLiens.id_auteur),
+        if PRELOAD.loaded:
+            authors = tuple(PRELOAD.linked_authors.get((self._objet, self._id), ()))
+        else:
+            authors = tuple(
+                SpipAuteurs.select()
+                .join(
+                    SpipAuteursLiens,
+                    on=(SpipAuteurs.id_auteur == SpipAuteursLiens.id_auteur),
+                )
+                .where(
+                    (SpipAuteursLiens.id_objet == self._id)
+                    & (SpipAuteursLiens.objet == self._objet)
+                )
+                .order_by(SpipAuteurs.id_auteur)
             )
-            .where(SpipAuteursLiens.id_objet == self._id)
-        )
+        self._relations["authors"] = authors
+        return authors
 
     def taxonomies(self) -> tuple[SpipMots, ...]:
+        if "taxonomies" in self._relations:
+            return self._relations["taxonomies"]
         LOG.debug(f"Initialize taxonomies of `{self._url_title}`")
-        return (
-            SpipMots.select()
-            .join(
-                SpipMotsLiens,
-                on=(SpipMots.id_mot == SpipMotsLiens.id_mot),
+        if PRELOAD.loaded:
+            tags = tuple(PRELOAD.linked_taxonomies.get((self._objet, self._id), ()))
+        else:
+            tags = tuple(
+                SpipMots.select()
+                .join(
+                    SpipMotsLiens,
+                    on=(SpipMots.id_mot == SpipMotsLiens.id_mot),
+                )
+                .where(
+                    (SpipMotsLiens.id_objet == self._id)
+                    & (SpipMotsLiens.objet == self._objet)
+                )
+                .order_by(SpipMots.id_mot)
             )
-            .where(SpipMotsLiens.id_objet == self._id)
-        )
+        self._relations["taxonomies"] = tags
+        return tags
+
+    # Get the fields written without being converted at once with the others
+    def written_fields(self) -> tuple[Optional[str], ...]:
+        return (self.descriptif,)
+
+    # Get the fields that convert will convert in each of langs with their
+    # keep_markup, translated & with their links replaced like convert does, so
+    # that workers can convert them ahead
+    def fields_ahead(self, langs: list[str]) -> list[tuple[str, bool]]:
+        fields: list[tuple[Optional[str], bool]] = []
+        storage_lang: Optional[str] = CFG.storage_language
+        for lang in langs:
+            obj = self.translation()
+            if obj.titre is not None:
+                storage_title: str = obj.translate_multi(
+                    lang if storage_lang is None else storage_lang,
+                    obj.titre.strip(),
+                    False,
+                )
+                url_title: str = obj.translate_multi(lang, obj.titre.strip())
+                fields.append((obj.replace_links(storage_title, False), True))
+                fields.append(
+                    (obj.replace_links(url_title, False), CFG.metadata_markup)
+                )
+            if obj.texte is not None:
+                text: str = obj.translate_multi(lang, obj.texte.strip())
+                fields.append((obj.replace_links(text, False), True))
+            if obj.extra is not None:
+                fields.append(
+                    (obj.replace_links(obj.extra, False), CFG.metadata_markup)
+                )
+            for tag in obj.taxonomies():
+                if str(tag.type) not in CFG.ignore_taxonomies:
+                    fields.append(
+                        (obj.translate_multi(lang, str(tag.descriptif), False), True)
+                    )
+        fields += ((field, True) for field in self.written_fields())
+        return [
+            (field, keep_markup)
+            for field, keep_markup in dict.fromkeys(fields)
+            if field is not None and len(field) > 0
+        ]
+
+    # Convert, in a worker process, fields with their keep_markup for an object of
+    # class cls & title titre, returning the conversions by (field, keep_markup)
+    @classmethod
+    def convert_ahead(
+        cls, titre: Optional[str], fields: list[tuple[str, bool]]
+    ) -> dict[tuple[str, bool], Conversion]:
+        obj = cls(titre=titre)
+        return {
+            (field, keep_markup): obj.conversion(field, keep_markup)
+            for field, keep_markup in fields
+        }
+
+    # Yield each of children along with the conversions made for it in langs by
+    # workers, setting them as the conversions of the child
+    @staticmethod
+    def ahead(children: Iterable[Any], langs: list[str]) -> Iterator[Any]:
+        def task(obj: Any) -> Optional[tuple[Any, ...]]:
+            if not isinstance(obj, SpipRedactional):
+                return None
+            return type(obj).convert_ahead, obj.titre, obj.fields_ahead(langs)
+
+        def size(obj: Any) -> int:
+            return sum(len(v) for v in obj.__data__.values() if type(v) is str)
+
+        for obj, converted in POOL.ahead(children, task, size):
+            if converted is not None:
+                obj._converted = converted
+            yield obj
 
     # Write all the documents of this object
     def write_children(
@@ -699,7 +1085,7 @@ class SpipRedactional(SpipWritable):
         output: list[str] = []
         total = len(children)
         i = 0
-        for obj in children:
+        for obj in self.ahead(children, [forcedlang]):
             try:
                 output.append(
                     obj.write_all(
@@ -721,8 +1107,82 @@ class SpipRedactional(SpipWritable):
                 LOG.debug(err)
         return output
 
+    # Get the children of this object, by name of their kind
+    def children(self) -> dict[str, tuple[Any, ...]]:
+        return {"documents": self.documents()}
+
+    # Write all the children of this object in each of its translations
+    def write_children_translations(
+        self,
+        children: tuple[Document] | tuple[Any],
+        translations: dict[str, "SpipRedactional"],
+    ) -> dict[str, list[Any]]:
+        LOG.debug(f"Writing children of {type(self).__name__} `{self._url_title}`")
+        output: dict[str, list[Any]] = {lang: [] for lang in translations}
+        parents: dict[str, tuple[int, str, str]] = {
+            lang: (obj._depth, obj.dest_directory(), obj.url())
+            for lang, obj in translations.items()
+        }
+        total = len(children)
+        for obj in self.ahead(children, list(translations)):
+            # Index of child in each language, not counting the ones that weren’t
+            indexes: dict[str, int] = {lang: len(output[lang]) for lang in output}
+            for lang, written in obj.write_translations(
+                parents, indexes, total
+            ).items():
+                output[lang].append(written)
+        return output
+
+    # Perform all the write steps of this object once for every parent translation,
+    # parents being (depth, directory, url) of each of them by language
+    def write_translations(
+        self,
+        parents: dict[str, tuple[int, str, str]],
+        indexes: dict[str, int],
+        total: int,
+    ) -> dict[str, DeepDict]:
+        output: dict[str, DeepDict] = {}
+        translations: dict[str, SpipRedactional] = {}
+        for lang, (parentdepth, parentdir, parenturl) in parents.items():
+            obj = self.translation()
+            try:
+                obj.prepare(lang, parentdir, parenturl)
+            except (
+                LangNotFoundError,
+                DontExportDraftError,
+                DontExportEmptyError,
+                IgnoredPatternError,
+            ) as err:
+                LOG.debug(err)
+                continue
+            output[lang] = {
+                "msg": SpipWritable.write_all(
+                    obj, parentdepth, parentdir, indexes[lang], total, parenturl
+                )
+            }
+            translations[lang] = obj
+        if len(translations) > 0:
+            # Fetch children once, with any translation as they all have the same ID
+            first: SpipRedactional = next(iter(translations.values()))
+            for kind, children in first.children().items():
+                written = first.write_children_translations(children, translations)
+                for lang, objects in written.items():
+                    output[lang][kind] = objects
+        return output
+
     # Write object to output destination
     def write(self) -> str:
+        storage_lang: str = (
+            CFG.storage_language if CFG.storage_language is not None else self.lang
+        )
+        if self._unchanged:  # Keep the file of the previous export
+            LINKS.register(self, storage_lang)
+            return self.dest_path()
+        # Start from the counter that the index of links resolved the collisions of
+        # directories names with, that links to this object already point to
+        placement: Optional[tuple[str, int]] = LINKS.placement(self, storage_lang)
+        if placement is not None and placement[0] == self._storage_title:
+            self._storage_title_append = placement[1]
         # Make a directory for this object if there isn’t
         # If it cannot for incompatibility, try until it can
         incompatible: bool = True
@@ -736,50 +1196,143 @@ class SpipRedactional(SpipWritable):
                 incompatible = False
                 # Create a new directory if write is about to overwrite an existing file
                 # or to write into a directory without the same fileprefix
-                for file in listdir(directory):
-                    if isfile(directory + file):
+                for file in OUTPUT.files(directory):
+                    LOG.debug(
+                        f"Can {type(self).__name__} `{self.dest_path()}` of prefix "
+                        + f"{self._fileprefix} and suffix {CFG.export_filetype}"
+                        + f" be written along with `{file}` of prefix "
+                        + f"`{file.split('.')[0]}` and suffix {file.split('.')[-1]}"
+                        + f"` in {self.dest_directory()}` ?"
+                    )
+                    # Resolve conflict at first incompatible file encountered
+                    if directory + file == self.dest_path() or (
+                        file.split(".")[-1] == CFG.export_filetype
+                        and file.split(".")[0] != self._fileprefix
+                    ):
                         LOG.debug(
-                            f"Can {type(self).__name__} `{self.dest_path()}` of prefix "
-                            + f"{self._fileprefix} and suffix {CFG.export_filetype}"
-                            + f" be written along with `{file}` of prefix "
-                            + f"`{file.split('.')[0]}` and suffix {file.split('.')[-1]}"
-                            + f"` in {self.dest_directory()}` ?"
+                            f"No, incrementing counter of {self.dest_directory()}"
                         )
-                        # Resolve conflict at first incompatible file encountered
-                        if directory + file == self.dest_path() or (
-                            file.split(".")[-1] == CFG.export_filetype
-                            and file.split(".")[0] != self._fileprefix
-                        ):
-                            LOG.debug(
-                                f"No, incrementing counter of {self.dest_directory()}"
-                            )
-                            self._storage_title_append += 1
-                            incompatible = True
-                            break
+                        self._storage_title_append += 1
+                        incompatible = True
+                        break
 
+        # Record the directory that was finally chosen, for links to this object
+        LINKS.register(self, storage_lang)
         # Write the content of this object into a file named as self.filename()
-        with open(self.dest_path(), "w") as f:
-            f.write(self.content())
+        content: str = self.content()
+        OUTPUT.write(self.dest_path(), content, self.write_error)
+        files: list[str] = [self.dest_path()]
         # Write the eventual static image of this object
         if self._static_img_path:
-            copyfile(
-                self._static_img_path,
-                self.dest_directory() + basename(self._static_img_path),
+            files.append(self.dest_directory() + basename(self._static_img_path))
+            OUTPUT.copy(self._static_img_path, files[-1], self.write_error)
+        if self._manifest is not None:
+            key, depends = self._manifest
+            MANIFEST.record(
+                key,
+                depends,
+                files,
+                content,
+                storage_title=self._storage_title,
+                url_title=self._url_title,
+                append=self._storage_title_append,
             )
         return self.dest_path()
 
-    # Append static images based on filename instead of DB to objects texts
-    def append_static_images(self, obj_str: str = "art", load_str: str = "on"):
+    # Get the path of the static image of this object, named after its ID
+    def static_image(self, obj_str: str = "art", load_str: str = "on") -> Optional[str]:
         for t in IMG_TYPES:
             path: str = CFG.data_dir + obj_str + load_str + str(self._id) + "." + t
             LOG.debug(f"Search static image of `{self._url_title}` at: {path}")
             if isfile(path):
                 LOG.debug(f"Found static image of `{self._url_title}` at: {path}")
-                # Append static image to content
-                self._text += f"\n\n![]({basename(path)})"
-                # Store it’s path to write it later
-                self._static_img_path = path
-                break
+                return path
+        return None
+
+    # Append static images based on filename instead of DB to objects texts
+    def append_static_images(self, obj_str: str = "art", load_str: str = "on"):
+        path: Optional[str] = self.static_image(obj_str, load_str)
+        if path is not None:
+            # Append static image to content
+            self._text += f"\n\n![]({basename(path)})"
+            # Store it’s path to write it later
+            self._static_img_path = path
+
+    # Titles & paths of the targets of the internal links of this object, as seen
+    # from it in lang & in its own lang. Can include targets that aren’t linked
+    def link_targets(self, lang: str) -> list[Optional[tuple[str, str]]]:
+        targets: list[Optional[tuple[str, str]]] = []
+        sources: list[SpipRedactional] = []
+        for source_lang in sorted({lang, self.lang}):
+            sources.append(self.translation())
+            sources[-1].lang = source_lang
+        for text in (self.titre, self.texte, self.extra):
+            if text is None:
+                continue
+            for m in LINK_TARGET.finditer(text):
+                for source in sources:
+                    targets.append(
+                        LINKS.target(
+                            LINK_TARGET_OBJETS[m.group(1).lower()],
+                            int(m.group(2)),
+                            source,
+                        )
+                    )
+        return targets
+
+    # Hash of what the export of this object in lang, into parentdir, depends on
+    def dependencies(self, lang: str, parentdir: str, parenturl: str) -> str:
+        static_image: Optional[str] = self.static_image()
+        depends = sha256()
+        for part in (
+            self.maj,
+            MANIFEST.relative(parentdir),
+            parenturl,
+            LINKS.placement(
+                self,
+                CFG.storage_language if CFG.storage_language is not None else lang,
+            ),
+            [(d.id_document, d.titre, d.fichier, d.maj) for d in self.documents()],
+            [(a.id_auteur, a.nom) for a in self.authors()],
+            [(t.id_mot, t.type, t.titre, t.descriptif) for t in self.taxonomies()],
+            self.link_targets(lang),
+            (
+                (static_image, getsize(static_image), getmtime(static_image))
+                if static_image is not None
+                else None
+            ),
+        ):
+            depends.update(repr(part).encode())
+        return depends.hexdigest()
+
+    # Convert this object to lang, unless the previous export of it in lang can be
+    # kept because nothing it depends on changed
+    def prepare(self, lang: str, parentdir: str, parenturl: str) -> None:
+        if not MANIFEST.enabled:
+            self.convert(lang)
+            return
+        key: str = MANIFEST.key(self._objet, self._id, lang)
+        depends: str = self.dependencies(lang, parentdir, parenturl)
+        entry: Optional[dict[str, Any]] = MANIFEST.reuse(key, depends)
+        if entry is not None:
+            if "error" in entry:  # It was cancelled for the same reason
+                raise CANCELLING_ERRORS[entry["error"]](entry["message"])
+            self.lang = lang
+            self._storage_title = entry["storage_title"]
+            self._url_title = entry["url_title"]
+            self._storage_title_append = entry["append"]
+            self._unchanged = True
+            return
+        self._manifest = (key, depends)
+        try:
+            self.convert(lang)
+        except (
+            LangNotFoundError,
+            DontExportDraftError,
+            IgnoredPatternError,
+        ) as err:
+            MANIFEST.cancel(key, depends, err)
+            raise
 
     # Apply post-init conversions and cancel the export if self not of the right lang
     def convert(self, forced_lang: str) -> None:
@@ -798,6 +1351,8 @@ class SpipRedactional(SpipWritable):
 
 class Article(SpipRedactional, SpipArticles):
     _fileprefix: str = "index"
+    _objet: str = "article"
+    _deferred: tuple[str, ...] = ("texte", "chapo", "ps", "extra")  # Long texts
     _style = (BOLD, YELLOW)  # Articles accent color is yellow
 
     class Meta:
@@ -808,11 +1363,31 @@ class Article(SpipRedactional, SpipArticles):
         self._id = self.id_article
         # Initialize converted fields beginning with underscore
         self._accept_forum = self.accepter_forum == "oui"
-        self._surtitle = self.convert_field(str(self.surtitre))
-        self._subtitle = self.convert_field(str(self.soustitre))
-        self._caption = self.convert_field(str(self.chapo))
-        self._ps = self.convert_field(str(self.ps))
-        self._microblog = self.convert_field(str(self.microblog))
+
+    # Converted fields, only when they’re used
+    @property
+    def _surtitle(self) -> str:
+        return self.memoized("_surtitle", str(self.surtitre))
+
+    @property
+    def _subtitle(self) -> str:
+        return self.memoized("_subtitle", str(self.soustitre))
+
+    @property
+    def _caption(self) -> str:
+        return self.memoized("_caption", str(self.chapo))
+
+    @property
+    def _ps(self) -> str:
+        return self.memoized("_ps", str(self.ps))
+
+    @property
+    def _microblog(self) -> str:
+        return self.memoized("_microblog", str(self.microblog))
+
+    # Get the fields written without being converted at once with the others
+    def written_fields(self) -> tuple[Optional[str], ...]:
+        return (self.descriptif, str(self.chapo), str(self.ps), str(self.microblog))
 
     def frontmatter(self, append: Optional[dict[str, Any]] = None) -> str:
         meta: dict[str, Any] = {
@@ -856,7 +1431,7 @@ class Article(SpipRedactional, SpipArticles):
         forced_lang: str,
         parenturl: str,
     ) -> DeepDict:
-        self.convert(forced_lang)
+        self.prepare(forced_lang, storage_parentdir, parenturl)
         return {
             "msg": super().write_all(
                 parentdepth, storage_parentdir, index, total, parenturl
@@ -865,8 +1440,86 @@ class Article(SpipRedactional, SpipArticles):
         }
 
 
+# Deferred columns of the objects of a listing, read at once for all of them when
+# one of these columns of one of the objects is accessed for the first time
+class DeferredRows:
+    def __init__(self, model: type[Model], ids: list[int]):
+        self.model: type[Model] = model
+        self.ids: list[int] = ids
+        self.rows: Optional[dict[int, dict[str, Any]]] = None
+
+    # Set the deferred columns of instance, reading them if it wasn’t done yet
+    def load(self, instance: Model) -> None:
+        key: Field = self.model._meta.primary_key
+        if self.rows is None:
+            LOG.debug(
+                f"Fetch deferred columns of {len(self.ids)} {self.model.__name__}"
+            )
+            self.rows = {
+                row.pop(key.name): row
+                for row in self.model.select(
+                    key, *(self.model._meta.fields[n] for n in self.model._deferred)
+                )
+                .where(key.in_(self.ids))
+                .dicts()
+            }
+        # If the row was deleted in the meantime, consider its columns empty
+        deferred: dict[str, Any] = {name: None for name in self.model._deferred}
+        instance.__data__.update(self.rows.get(instance.__data__[key.name], deferred))
+
+
+# Field accessor of a column that listings can leave unread, see DeferredRows
+class DeferredAccessor(FieldAccessor):
+    def __get__(self, instance: Optional[Model], instance_type: Any = None) -> Any:
+        if instance is not None and self.name not in instance.__data__:
+            group: Optional[DeferredRows] = getattr(instance, "_deferred_rows", None)
+            if group is not None:
+                group.load(instance)
+        return super().__get__(instance, instance_type)
+
+
+# Rows of a query, read batch_size rows at a time in the order of the query, so that
+# only one batch of them is held in memory while they are written. Only the IDs of
+# the rows are read at first, then each batch is fetched with an IN query.
+# If CFG.defer_text_columns, the deferred columns of the model are left out
+class BatchedQuery:
+    def __init__(self, query: ModelSelect, batch_size: int):
+        self.model: type[Model] = query.model
+        key: Field = self.model._meta.primary_key
+        self.ids: list[int] = [i for (i,) in query.select(key).tuples()]
+        # Without batch size, fetch every row in one batch
+        self.batch_size: int = batch_size if batch_size > 0 else max(len(self.ids), 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # Yield model instances, initialized only when they are needed
+    def __iter__(self) -> Iterator[Any]:
+        key: Field = self.model._meta.primary_key
+        fields: list[Field] = self.model._meta.sorted_fields
+        if CFG.defer_text_columns:
+            fields = [f for f in fields if f.name not in self.model._deferred]
+        for start in range(0, len(self.ids), self.batch_size):
+            batch: list[int] = self.ids[start : start + self.batch_size]
+            LOG.debug(f"Fetch {len(batch)} {self.model.__name__} from {start}")
+            deferred = DeferredRows(self.model, batch)
+            # .iterator() prevents peewee from caching the rows in the query
+            rows: dict[int, dict[str, Any]] = {
+                row[key.name]: row
+                for row in self.model.select(*fields)
+                .where(key.in_(batch))
+                .dicts()
+                .iterator()
+            }
+            for i in batch:
+                if i in rows:  # Ignore rows that were deleted in the meantime
+                    yield self.model(**rows.pop(i), _deferred_rows=deferred)
+
+
 class Section(SpipRedactional, SpipRubriques):
     _fileprefix: str = "_index"
+    _objet: str = "rubrique"
+    _deferred: tuple[str, ...] = ("texte", "extra")  # Long texts
     _style = (BOLD, GREEN)  # Sections accent color is green
 
     class Meta:
@@ -887,22 +1540,51 @@ class Section(SpipRedactional, SpipRubriques):
     # Get articles of this section
     def articles(self, limit: int = 10**6) -> tuple[Article]:
         LOG.debug(f"Initialize articles of `{self._url_title}`")
-        return (
+        if PRELOAD.loaded:
+            return tuple(
+                Article(**row)
+                for row in PRELOAD.section_articles.get(self._id, [])[:limit]
+            )
+        query = (
             Article.select()
             .where(Article.id_rubrique == self._id)
             .order_by(Article.date.desc())
             .limit(limit)
         )
+        if CFG.fetch_batch_size > 0 or CFG.defer_text_columns:
+            return BatchedQuery(query, CFG.fetch_batch_size)
+        return tuple(query)
+
+    # Get the children of this section, by name of their kind
+    def children(self) -> dict[str, tuple[Any, ...]]:
+        return {
+            "documents": self.documents(),
+            "articles": self.articles(),
+            "sections": self.sections(),
+        }
 
     # Get subsections of this section
     def sections(self, limit: int = 10**6) -> tuple["Section"]:
         LOG.debug(f"Initialize subsections of `{self._url_title}`")
-        return (
+        return self.children_of(self._id, limit)
+
+    # Get sections of which parent is parent_id, root sections being of parent 0
+    @staticmethod
+    def children_of(parent_id: int, limit: int = 10**6) -> tuple["Section"]:
+        if PRELOAD.loaded:
+            return tuple(
+                Section(**row)
+                for row in PRELOAD.section_sections.get(parent_id, [])[:limit]
+            )
+        query = (
             Section.select()
-            .where(Section.id_parent == self._id)
+            .where(Section.id_parent == parent_id)
             .order_by(Section.date.desc())
             .limit(limit)
         )
+        if CFG.fetch_batch_size > 0 or CFG.defer_text_columns:
+            return BatchedQuery(query, CFG.fetch_batch_size)
+        return tuple(query)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -919,7 +1601,7 @@ class Section(SpipRedactional, SpipRubriques):
         forced_lang: str,
         parenturl: str = "",
     ) -> DeepDict:
-        self.convert(forced_lang)
+        self.prepare(forced_lang, storage_parentdir, parenturl)
         return {
             "msg": super().write_all(
                 parentdepth, storage_parentdir, index, total, parenturl
@@ -929,6 +1611,334 @@ class Section(SpipRedactional, SpipRubriques):
             "sections": self.write_children(self.sections(), forced_lang),
         }
 
+    # Get the path of the static image of this section, named after its ID
+    def static_image(self, obj_str: str = "rub", load_str: str = "on") -> Optional[str]:
+        return super().static_image(obj_str, load_str)
+
     # Append static images based on filename instead of DB to objects texts
     def append_static_images(self, obj_str: str = "rub", load_str: str = "on"):
         super().append_static_images(obj_str, load_str)
+
+
+# Read the long texts of objects on first access if listings left them unread
+for model in (Article, Section):
+    for name in model._deferred:
+        setattr(model, name, DeferredAccessor(model, model._meta.fields[name], name))
+
+
+# Titles & output paths of every object that can be the target of an internal link,
+# computed once per storage language so that links are replaced with dict lookups.
+# It tells which objects will be exported & in which languages, and resolves the
+# collisions of their directories names up front, in the order of the export, so
+# that links to objects that aren’t written yet point to where they will be
+class LinkIndex:
+    def __init__(self):
+        # By storage language, titles of sections and articles by (objet, id)
+        self._titles: dict[str, dict[tuple[str, int], str]] = {}
+        # By storage language, directories (relative to output dir) of exported
+        # sections and articles, counters appended to them & languages they’re
+        # exported in, by (objet, id)
+        self._directories: dict[str, dict[tuple[str, int], str]] = {}
+        self._appends: dict[str, dict[tuple[str, int], int]] = {}
+        self._langs: dict[str, dict[tuple[str, int], tuple[str, ...]]] = {}
+        # By storage language, documents title, output name & objects they’re in
+        self._documents: dict[str, dict[int, tuple[str, str, list[tuple]]]] = {}
+
+    # Get (id, parent id, title, lang, text) of sections & articles, ordered like
+    # the children of sections, and documents rows. Texts are None if they don’t
+    # contain <multi> blocks, in which they could be translated
+    @staticmethod
+    def rows() -> tuple[list[tuple], list[tuple], list[dict[str, Any]], dict]:
+        if PRELOAD.loaded:
+            sections = [
+                (
+                    row["id_rubrique"],
+                    row["id_parent"],
+                    row["titre"],
+                    row["lang"],
+                    row["texte"],
+                )
+                for row in PRELOAD.sections.values()
+            ]
+            articles = [
+                (
+                    row["id_article"],
+                    row["id_rubrique"],
+                    row["titre"],
+                    row["lang"],
+                    row["texte"],
+                )
+                for row in PRELOAD.articles.values()
+            ]
+            documents = list(PRELOAD.documents.values())
+            links = {id_document: [] for id_document in PRELOAD.documents.keys()}
+            for link, docs in PRELOAD.linked_documents.items():
+                for doc in docs:
+                    links[doc["id_document"]].append(link)
+            return sections, articles, documents, links
+        texts: dict[int, str] = dict(
+            SpipRubriques.select(SpipRubriques.id_rubrique, SpipRubriques.texte)
+            .where(SpipRubriques.texte.contains("<multi"))
+            .tuples()
+        )
+        sections = [
+            (*row, texts.get(row[0]))
+            for row in SpipRubriques.select(
+                SpipRubriques.id_rubrique,
+                SpipRubriques.id_parent,
+                SpipRubriques.titre,
+                SpipRubriques.lang,
+            )
+            .order_by(SpipRubriques.date.desc())
+            .tuples()
+        ]
+        texts = dict(
+            SpipArticles.select(SpipArticles.id_article, SpipArticles.texte)
+            .where(SpipArticles.texte.contains("<multi"))
+            .tuples()
+        )
+        articles = [
+            (*row, texts.get(row[0]))
+            for row in SpipArticles.select(
+                SpipArticles.id_article,
+                SpipArticles.id_rubrique,
+                SpipArticles.titre,
+                SpipArticles.lang,
+            )
+            .order_by(SpipArticles.date.desc())
+            .tuples()
+        ]
+        documents = list(
+            SpipDocuments.select(
+                SpipDocuments.id_document,
+                SpipDocuments.titre,
+                SpipDocuments.fichier,
+                SpipDocuments.statut,
+            ).dicts()
+        )
+        links = {doc["id_document"]: [] for doc in documents}
+        for id_document, objet, id_objet in SpipDocumentsLiens.select(
+            SpipDocumentsLiens.id_document,
+            SpipDocumentsLiens.objet,
+            SpipDocumentsLiens.id_objet,
+        ).tuples():
+            if id_document in links:
+                links[id_document].append((objet, id_objet))
+        return sections, articles, documents, links
+
+    # Storage title of an object, converted like in SpipRedactional.convert_title,
+    # without counting repairs or logging warnings, that its export will do
+    @staticmethod
+    def storage_title(obj: "SpipRedactional", storage_lang: str) -> str:
+        if obj.titre is None or len(obj.titre) == 0:
+            return ""
+        obj._url_title = obj.titre.strip()
+        return obj.conversion(obj.translate_multi(storage_lang, obj._url_title, False))[
+            0
+        ]
+
+    # Slugified directory name of an object, like in SpipRedactional.dest_directory
+    @staticmethod
+    def slug(obj_id: int, title: str) -> str:
+        _id: str = str(obj_id) + "-" if CFG.prepend_id else ""
+        return slugify(_id + title, max_length=CFG.title_max_length)
+
+    # Languages among langs in which an object of storage title is exported, like
+    # SpipRedactional.convert tells: the ones of the object or of its <multi> blocks,
+    # if its titles don’t match an ignore pattern
+    @staticmethod
+    def exported(
+        obj: "SpipRedactional", storage_title: str, langs: tuple[str, ...]
+    ) -> tuple[str, ...]:
+        translations: set[str] = set()
+        for text in (obj.titre, obj.texte):
+            if text is not None:
+                for piece in obj.split_multi(text):
+                    if type(piece) is tuple:
+                        translations.update(piece[1])
+        exported: list[str] = []
+        for lang in langs:
+            if lang != obj.lang and lang.lower() not in translations:
+                continue
+            titles: list[str] = [storage_title]
+            if len(CFG.ignore_patterns) > 0 and obj.titre is not None:
+                titles.append(
+                    obj.conversion(
+                        obj.translate_multi(lang, obj.titre.strip(), False),
+                        CFG.metadata_markup,
+                    )[0]
+                )
+            if not any(
+                match(p, title, I) for p in CFG.ignore_patterns for title in titles
+            ):
+                exported.append(lang)
+        return tuple(exported)
+
+    # Compute titles & directories of every object for a given storage language
+    def build(self, storage_lang: str) -> None:
+        LOG.debug(f"Build {storage_lang} index of internal links targets")
+        sections, articles, documents, links = self.rows()
+        # Languages of the export in this storage language
+        langs: tuple[str, ...] = (
+            tuple(CFG.export_languages)
+            if CFG.storage_language is not None
+            else (storage_lang,)
+        )
+        titles: dict[tuple[str, int], str] = {}
+        objects: dict[tuple[str, int], SpipRedactional] = {}
+        # Sections & articles written in the directory of each section, in order
+        children: dict[int, list[tuple[str, int]]] = {}
+        for id_rubrique, id_parent, titre, lang, texte in sections:
+            key = ("rubrique", id_rubrique)
+            objects[key] = Section(
+                id_rubrique=id_rubrique,
+                id_parent=id_parent,
+                titre=titre,
+                lang=lang,
+                texte=texte,
+            )
+            titles[key] = self.storage_title(objects[key], storage_lang)
+        for id_article, id_rubrique, titre, lang, texte in articles:
+            key = ("article", id_article)
+            objects[key] = Article(
+                id_article=id_article,
+                id_rubrique=id_rubrique,
+                titre=titre,
+                lang=lang,
+                texte=texte,
+            )
+            titles[key] = self.storage_title(objects[key], storage_lang)
+            # Articles of a section are written before its subsections
+            if id_rubrique != 0:  # There are no root articles
+                children.setdefault(id_rubrique, []).append(key)
+        for id_rubrique, id_parent, _, _, _ in sections:
+            children.setdefault(id_parent, []).append(("rubrique", id_rubrique))
+
+        # Walk the tree like the export, giving the same directory name to only one
+        # object of a directory & appending counters to the name of the next ones
+        directories: dict[tuple[str, int], str] = {}
+        appends: dict[tuple[str, int], int] = {}
+        exported: dict[tuple[str, int], tuple[str, ...]] = {}
+
+        def walk(id_rubrique: int, directory: str, parent_langs: tuple[str, ...]):
+            counters: dict[str, int] = {}  # Objects named after each slug
+            for key in children.get(id_rubrique, []):
+                if key in exported:  # Prevents infinite loops on broken trees
+                    continue
+                obj_langs = self.exported(objects[key], titles[key], parent_langs)
+                if len(obj_langs) == 0:
+                    continue
+                slug: str = self.slug(key[1], titles[key])
+                appends[key] = counters.get(slug, 0)
+                counters[slug] = appends[key] + 1
+                directories[key] = (
+                    directory
+                    + slug
+                    + ("_" + str(appends[key]) if appends[key] > 0 else "")
+                    + r"/"
+                )
+                exported[key] = obj_langs
+                if key[0] == "rubrique":
+                    walk(key[1], directories[key], obj_langs)
+
+        walk(0, "", langs)
+        self._titles[storage_lang] = titles
+        self._directories[storage_lang] = directories
+        self._appends[storage_lang] = appends
+        self._langs[storage_lang] = exported
+        self._documents[storage_lang] = {}
+        for row in documents:
+            doc = Document(
+                id_document=row["id_document"],
+                titre=row["titre"],
+                fichier=row["fichier"],
+                statut=row["statut"],
+            )
+            if doc._draft and not CFG.export_drafts:  # Its files aren’t copied
+                continue
+            doc._storage_title = doc.conversion(doc.titre or "")[0]
+            doc._storage_parentdir = ""
+            self._documents[storage_lang][doc._id] = (
+                doc._storage_title,
+                doc.dest_path(),
+                sorted(links[doc._id]),
+            )
+
+    # Get the storage title of obj as indexed & the counter to append to its
+    # directory name, or None if it isn’t exported
+    def placement(
+        self, obj: "SpipRedactional", storage_lang: str
+    ) -> Optional[tuple[str, int]]:
+        if storage_lang not in self._directories:
+            self.build(storage_lang)
+        key: tuple[str, int] = (obj._objet, obj._id)
+        if key not in self._appends[storage_lang]:
+            return None
+        return self._titles[storage_lang][key], self._appends[storage_lang][key]
+
+    # Record the real directory of an object, that can differ from the computed one
+    # when its title contains links or collides with a name that wasn’t foreseen
+    def register(self, obj: "SpipRedactional", storage_lang: str) -> None:
+        if storage_lang not in self._directories:
+            self.build(storage_lang)
+        directory: str = obj.dest_directory()
+        if directory.startswith(CFG.output_dir):
+            directory = directory[len(CFG.output_dir) :]
+        self._directories[storage_lang][(obj._objet, obj._id)] = directory
+
+    # Get the directory of the exported object of key & the language of the file of
+    # it to link to: lang if it’s exported in it, or the first export language it is
+    def location(self, key: tuple[str, int], lang: str) -> Optional[tuple[str, str]]:
+        for file_lang in (lang, *CFG.export_languages):
+            storage_lang: str = (
+                CFG.storage_language if CFG.storage_language is not None else file_lang
+            )
+            if storage_lang not in self._directories:
+                self.build(storage_lang)
+            directory: Optional[str] = self._directories[storage_lang].get(key)
+            # Registered objects that weren’t foreseen are exported in their lang
+            if directory is not None and file_lang in self._langs[storage_lang].get(
+                key, (file_lang,)
+            ):
+                return directory, file_lang
+        return None
+
+    # Get the title of object of type objet and id obj_id, and its path relative to
+    # the directory of source, or None if there’s no such object or it isn’t exported
+    def target(
+        self, objet: str, obj_id: int, source: "SpipRedactional"
+    ) -> Optional[tuple[str, str]]:
+        storage_lang: str = (
+            CFG.storage_language if CFG.storage_language is not None else source.lang
+        )
+        if storage_lang not in self._titles:
+            self.build(storage_lang)
+        directories = self._directories[storage_lang]
+        source_dir: str = directories.get((source._objet, source._id), "") or "."
+        if objet == "document":
+            if obj_id not in self._documents[storage_lang]:
+                return None
+            title, name, attached = self._documents[storage_lang][obj_id]
+            # Link to the copy of the document along with source, or to the first one
+            # that is along with an exported object
+            if (source._objet, source._id) in attached:
+                return title, name
+            for obj in attached:
+                if obj in directories:
+                    return title, relpath(directories[obj] + name, source_dir)
+            return None
+        location: Optional[tuple[str, str]] = self.location(
+            (objet, obj_id), source.lang
+        )
+        if location is None:
+            return None
+        directory, lang = location
+        prefix: str = (
+            Section._fileprefix if objet == "rubrique" else Article._fileprefix
+        )
+        path: str = directory + prefix + "." + lang + "." + CFG.export_filetype
+        return self._titles[storage_lang][(objet, obj_id)], relpath(path, source_dir)
+
+
+# Global index of internal links targets, built at first use
+LINKS = LinkIndex()
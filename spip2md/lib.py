@@ -17,49 +17,58 @@ import logging
 from os import makedirs, remove
 from os.path import isfile
 from shutil import rmtree
+from sys import argv
 from typing import Optional
 
+from spip2md.cache import CONVERSIONS
 from spip2md.config import CFG, NAME
 from spip2md.extended_models import (
     DeepDict,
     DontExportDraftError,
     IgnoredPatternError,
     LangNotFoundError,
+    REPAIRS,
     Section,
 )
+from spip2md.manifest import MANIFEST
+from spip2md.output import OUTPUT
+from spip2md.parallel import POOL
+from spip2md.preload import PRELOAD
+from spip2md.database import init_database, source_name
+from spip2md.profiler import PROFILER
+from spip2md.regexmaps import ISO_UTF_REPAIRS
+from spip2md.snapshot import write_snapshot
 from spip2md.spip_models import DB
 from spip2md.style import BOLD, esc
 
 # Define loggers for this file
 ROOTLOG = logging.getLogger(NAME + ".root")
 TREELOG = logging.getLogger(NAME + ".tree")
-# Initialize the database with settings from CFG
-DB.init(CFG.db, host=CFG.db_host, user=CFG.db_user, password=CFG.db_pass)
 
 
 # Write the root sections and their subtrees
 def write_root(parent_dir: str, parent_id: int = 0) -> DeepDict:
     # Print starting message
+    user: str = ""
+    if CFG.db_type == "mysql":
+        user = f", as database user {esc(BOLD)}{CFG.db_user}{esc()}"
     print(
         f"""\
-Begin exporting {esc(BOLD)}{CFG.db}@{CFG.db_host}{esc()} SPIP database to plain \
+Begin exporting {esc(BOLD)}{source_name()}{esc()} SPIP database to plain \
 Markdown+YAML files,
-into the directory {esc(BOLD)}{parent_dir}{esc()}, \
-as database user {esc(BOLD)}{CFG.db_user}{esc()}
+into the directory {esc(BOLD)}{parent_dir}{esc()}{user}
 """
     )
     buffer: list[DeepDict] = []  # Define temporary storage for output
+    if CFG.single_traversal:
+        return {"sections": write_root_translations(parent_id)}
     # Write each sections (write their entire subtree) for each export language
     # Language specified in database can differ from markup, se we force a language
     #   and remove irrelevant ones at each looping
     for lang in CFG.export_languages:
         ROOTLOG.debug("Initialize root sections")
         # Get all sections of parentID ROOTID
-        child_sections: tuple[Section, ...] = (
-            Section.select()
-            .where(Section.id_parent == parent_id)
-            .order_by(Section.date.desc())
-        )
+        child_sections: tuple[Section, ...] = Section.children_of(parent_id)
         nb: int = len(child_sections)
         for i, s in enumerate(child_sections):
             ROOTLOG.debug(f"Begin exporting {lang} root section {i}/{nb}")
@@ -78,6 +87,26 @@ as database user {esc(BOLD)}{CFG.db_user}{esc()}
     return {"sections": buffer}
 
 
+# Write the root sections and their subtrees in every export language at once,
+# visiting & fetching each object a single time
+def write_root_translations(parent_id: int = 0) -> list[DeepDict]:
+    buffer: list[DeepDict] = []
+    ROOTLOG.debug("Initialize root sections")
+    child_sections: tuple[Section, ...] = Section.children_of(parent_id)
+    nb: int = len(child_sections)
+    # Root sections are all written directly into the output directory
+    parents: dict[str, tuple[int, str, str]] = {
+        lang: (-1, CFG.output_dir, "") for lang in CFG.export_languages
+    }
+    for i, s in enumerate(child_sections):
+        ROOTLOG.debug(f"Begin exporting root section {i}/{nb} in every language")
+        indexes: dict[str, int] = {lang: i for lang in CFG.export_languages}
+        buffer += s.write_translations(parents, indexes, nb).values()
+        print()  # Break line between level 0 sections in output
+        ROOTLOG.debug(f"Finished exporting root section {i}/{nb}")
+    return buffer
+
+
 # Count on outputted tree & print results if finished
 def summarize(
     tree: DeepDict | list[DeepDict] | list[str],
@@ -109,6 +138,12 @@ def summarize(
         for key, val in counter.items():
             totals += f"{esc(BOLD)}{val}{esc()} {key}, "
         print(f"Exported a total of {totals[:-2]}")
+        if len(REPAIRS) > 0:  # Tell which broken encodings were repaired
+            repairs: str = ", ".join(
+                f"{esc(BOLD)}{count}{esc()} {broken} -> {ISO_UTF_REPAIRS[broken]}"
+                for broken, count in REPAIRS.items()
+            )
+            print(f"Repaired broken encodings: {repairs}")
         # Warn about issued warnings in log file
         if isfile(CFG.logfile):
             print(
@@ -132,16 +167,63 @@ def init_logging(**kwargs) -> None:
 
 # Clear the output dir if needed & create a new
 def clear_output() -> None:
-    if CFG.clear_output:
+    # Incremental exports update the previous one instead
+    if CFG.clear_output and not MANIFEST.reusable and not CFG.write_changed_only:
         rmtree(CFG.output_dir, True)
     makedirs(CFG.output_dir, exist_ok=True)
+    if CFG.write_changed_only:  # Compare the files to write with the ones already there
+        OUTPUT.open(CFG.output_dir)
 
 
 # When directly executed as a script
 def cli():
     init_logging()  # Initialize logging and logfile
+    # With the snapshot command, only copy the database to CFG.db_snapshot
+    if "snapshot" in argv[1:]:
+        init_database()
+        if CFG.profile_queries > 0:
+            PROFILER.install(DB.obj)
+        write_snapshot()
+        if CFG.profile_queries > 0:
+            PROFILER.report(CFG.profile_queries)
+        return
+    if CFG.incremental:  # Read what the previous export wrote
+        MANIFEST.open(CFG.manifest)
     clear_output()  # Eventually remove already existing output dir
+    init_database()  # Connect DB to the data source set in configuration
+    if CFG.profile_queries > 0:  # Record the queries made to the database
+        PROFILER.install(DB.obj)
+    if CFG.conversion_cache is not None:  # Reuse conversions of previous runs
+        CONVERSIONS.open(CFG.conversion_cache)
 
     with DB:  # Connect to the database where SPIP site is stored in this block
-        # Write everything while printing the output human-readably
-        summarize(write_root(CFG.output_dir))
+        if CFG.preload:  # Load needed tables in memory instead of querying them
+            PRELOAD.load()
+        if MANIFEST.reusable:  # Remove objects deleted since previous export
+            MANIFEST.remove_deleted()
+        POOL.start(CFG.workers)  # Convert objects ahead in worker processes
+        OUTPUT.start(CFG.writer_threads, CFG.writer_queue_size)  # Write in background
+        try:
+            # Write everything while printing the output human-readably
+            tree: DeepDict = write_root(CFG.output_dir)
+            OUTPUT.flush()  # Wait for files still being written, printing errors
+            summarize(tree)
+        finally:
+            POOL.shutdown()
+            OUTPUT.shutdown()
+    if CFG.workers > 1:
+        POOL.report()
+    if MANIFEST.enabled:  # Remove what’s no longer exported & record this export
+        MANIFEST.close()
+        MANIFEST.report()
+    if OUTPUT.enabled:  # Remove what wasn’t written again
+        OUTPUT.close()
+        OUTPUT.report()
+    if CFG.deduplicate_documents is not None:
+        OUTPUT.report_deduplication()
+    if CONVERSIONS.enabled:
+        CONVERSIONS.close(CFG.conversion_cache_size * 1024**2)
+        CONVERSIONS.report()
+    # Print which queries took the most time
+    if CFG.profile_queries > 0:
+        PROFILER.report(CFG.profile_queries)
@@ -0,0 +1,255 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import logging
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from os import listdir, remove, replace
+from os.path import dirname, expanduser, isfile, islink, join, lexists
+from typing import Any, Optional
+
+from spip2md.config import CFG, NAME, Configuration
+from spip2md.output import OUTPUT, remove_empty_directories
+from spip2md.spip_models import SpipArticles, SpipRubriques
+from spip2md.style import BOLD, esc
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".manifest")
+
+# Configuration options that don’t change the exported files
+MANIFEST_IGNORED_OPTIONS = (
+    "db_max_connections",
+    "db_stale_timeout",
+    "db_consistent_snapshot",
+    "preload",
+    "fetch_batch_size",
+    "defer_text_columns",
+    "conversion_cache",
+    "conversion_cache_size",
+    "workers",
+    "clear_log",
+    "clear_output",
+    "write_changed_only",
+    "writer_threads",
+    "writer_queue_size",
+    "logfile",
+    "loglevel",
+    "profile_queries",
+    "incremental",
+    "manifest",
+)
+
+Entry = dict[str, Any]  # What the export of an object in a language depends on & made
+
+
+# Record of what the previous export wrote for every object in every language, and
+# of what it depended on, so that objects that didn’t change aren’t exported again.
+# Paths are relative to the output directory
+class Manifest:
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.fingerprint: str = ""  # Hash of spip2md sources & configuration
+        self.reusable: bool = False  # If the previous export can be updated
+        # Entries of objects by key, in the previous export and in this one
+        self.previous: dict[str, Entry] = {}
+        self.objects: dict[str, Entry] = {}
+        # Copied documents paths, with the last modification of their row
+        self.previous_documents: dict[str, str] = {}
+        self.documents: dict[str, str] = {}
+        self.unchanged: int = 0
+        self.exported: int = 0
+        self.removed: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    # Key of an object in a language
+    @staticmethod
+    def key(objet: str, obj_id: int, lang: str) -> str:
+        return f"{objet}/{obj_id}/{lang}"
+
+    # Hash of file at path relative to output directory, None if it doesn’t exist
+    @staticmethod
+    def file_hash(path: str) -> Optional[str]:
+        try:
+            with open(CFG.output_dir + path, "rb") as f:
+                return sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    # Path relative to output directory
+    @staticmethod
+    def relative(path: str) -> str:
+        if path.startswith(CFG.output_dir):
+            return path[len(CFG.output_dir) :]
+        return path
+
+    # Read the manifest of the previous export at path, if it was made by the same
+    # version of spip2md with the same configuration
+    def open(self, path: str) -> None:
+        self.path = expanduser(path)
+        try:
+            spip2md_version: str = version(NAME)
+        except PackageNotFoundError:
+            spip2md_version = "unknown"
+        fingerprint = sha256(spip2md_version.encode())
+        for option in sorted(vars(Configuration)):
+            if not option.startswith("_") and option not in MANIFEST_IGNORED_OPTIONS:
+                fingerprint.update(f"\0{option}={getattr(CFG, option)!r}".encode())
+        # Any change of the code can change the exported files
+        for source in sorted(listdir(dirname(__file__))):
+            if source.endswith(".py"):
+                with open(join(dirname(__file__), source), "rb") as f:
+                    fingerprint.update(f.read())
+        self.fingerprint = fingerprint.hexdigest()
+        if not isfile(self.path):
+            LOG.info(f"No manifest at {self.path}, exporting everything")
+            return
+        with open(self.path) as f:
+            manifest: dict[str, Any] = json.load(f)
+        if manifest.get("fingerprint") != self.fingerprint:
+            LOG.info(f"Manifest {self.path} made differently, exporting everything")
+            return
+        self.reusable = True
+        self.previous = manifest["objects"]
+        self.previous_documents = manifest["documents"]
+
+    # Remove the files of objects that were deleted from the database since the
+    # previous export, before any other gets their names
+    def remove_deleted(self) -> None:
+        existing: set[str] = {
+            f"article/{i}"
+            for (i,) in SpipArticles.select(SpipArticles.id_article).tuples()
+        } | {
+            f"rubrique/{i}"
+            for (i,) in SpipRubriques.select(SpipRubriques.id_rubrique).tuples()
+        }
+        for key in list(self.previous):
+            if key.rsplit("/", 1)[0] not in existing:
+                self.removed += self.forget(key)
+
+    # Get the previous entry of key if it depended on the same things and its files
+    # are still the same, otherwise remove its files & return None
+    def reuse(self, key: str, depends: str) -> Optional[Entry]:
+        entry: Optional[Entry] = self.previous.get(key)
+        if entry is None:
+            return None
+        if (
+            entry["depends"] == depends
+            and all(isfile(CFG.output_dir + path) for path in entry["files"])
+            and (
+                "hash" not in entry
+                or self.file_hash(entry["files"][0]) == entry["hash"]
+            )
+        ):
+            self.objects[key] = self.previous.pop(key)
+            for path in entry["files"]:
+                OUTPUT.keep(CFG.output_dir + path)
+            if "error" not in entry:
+                self.unchanged += 1
+            return entry
+        self.forget(key)
+        return None
+
+    # Remove the files of the previous export of key, returning how many there were.
+    # With the output stage, they are left to it, as they can be written again as is
+    def forget(self, key: str) -> int:
+        entry: Optional[Entry] = self.previous.pop(key, None)
+        removed: int = 0
+        if entry is not None and not OUTPUT.enabled:
+            for path in entry["files"]:
+                OUTPUT.wait(CFG.output_dir + path)
+                if lexists(CFG.output_dir + path):  # Even a link to a removed file
+                    LOG.debug(f"Remove {path} of previous export of {key}")
+                    remove(CFG.output_dir + path)
+                    removed += 1
+        return removed
+
+    # Record the export of key, depending on depends, that wrote content into files
+    def record(
+        self, key: str, depends: str, files: list[str], content: str, **fields: Any
+    ) -> None:
+        self.exported += 1
+        self.objects[key] = {
+            "depends": depends,
+            "files": [self.relative(path) for path in files],
+            "hash": sha256(content.encode()).hexdigest(),
+            **fields,
+        }
+
+    # Record that the export of key was cancelled by error
+    def cancel(self, key: str, depends: str, error: Exception) -> None:
+        self.objects[key] = {
+            "depends": depends,
+            "files": [],
+            "error": type(error).__name__,
+            "message": str(error),
+        }
+
+    # Tell if document at path was copied by the previous export from the same row,
+    # and record that it’s copied by this one. Symbolic links are made again, as the
+    # file they point to can have been removed
+    def copied(self, path: str, maj: str) -> bool:
+        path = self.relative(path)
+        self.documents[path] = maj
+        if (
+            self.previous_documents.get(path) == maj
+            and isfile(CFG.output_dir + path)
+            and not islink(CFG.output_dir + path)
+        ):
+            OUTPUT.keep(CFG.output_dir + path)
+            self.unchanged += 1
+            return True
+        return False
+
+    # Remove the files of the previous export that this one didn’t write, then the
+    # directories left empty, and write the manifest of this export
+    def close(self) -> None:
+        if self.path is None:
+            return
+        for key in list(self.previous):
+            self.removed += self.forget(key)
+        if not OUTPUT.enabled:  # Otherwise it removes what this export didn’t write
+            for path in self.previous_documents:
+                if path not in self.documents and lexists(CFG.output_dir + path):
+                    LOG.debug(f"Remove document {path} of previous export")
+                    remove(CFG.output_dir + path)
+                    self.removed += 1
+            remove_empty_directories(CFG.output_dir)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "objects": self.objects,
+                    "documents": self.documents,
+                },
+                f,
+            )
+        replace(self.path + ".tmp", self.path)  # Never leave a partial manifest
+        self.path = None
+
+    # Print how many objects were exported again
+    def report(self) -> None:
+        print(
+            f"Incremental export: {esc(BOLD)}{self.exported}{esc()} exported,"
+            + f" {esc(BOLD)}{self.unchanged}{esc()} unchanged,"
+            + f" {esc(BOLD)}{self.removed}{esc()} removed"
+        )
+
+
+# Global manifest of exported objects, only opened if CFG.incremental
+MANIFEST = Manifest()
@@ -0,0 +1,191 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import gzip
+import logging
+from os.path import expanduser
+from re import I, S, compile
+from typing import IO, Any, Iterator, Optional
+
+from spip2md.config import NAME
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".mysqldump")
+
+# Beginning of a table definition, followed by one column definition per line
+CREATE_TABLE = compile(r"CREATE TABLE (?:IF NOT EXISTS )?[`\"]?(\w+)[`\"]? *\(", I)
+COLUMN_DEFINITION = compile(r" *[`\"](\w+)[`\"] +\w")
+# Beginning of an insert statement, followed by the rows values
+INSERT_INTO = compile(
+    r"(?:INSERT(?: +IGNORE)?|REPLACE) +INTO +[`\"]?(\w+)[`\"]? *"
+    + r"(?:\(([^)]*)\))? *VALUES *",
+    I,
+)
+# A single value of a row, followed by the separator with the next value
+VALUE = compile(
+    r" *(?:'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)'|(NULL)|([-+]?[0-9.]+(?:[eE][-+]?\d+)?)"
+    + r"|0x([0-9A-Fa-f]*)|_binary *'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)') *([,)])",
+    S | I,
+)
+# A string value cut by a line break, that continues on next line
+UNFINISHED = compile(r" *(?:_binary *)?'[^'\\]*(?:(?:\\.|'')[^'\\]*)*\Z", S | I)
+# Escape sequences of MySQL strings, of which \% & \_ keep their backslash outside of
+# LIKE patterns, while an unknown one is the escaped character
+ESCAPE = compile(r"\\(.)|''", S)
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+ESCAPES |= {"%": "\\%", "_": "\\_"}
+
+Row = tuple[Any, ...]
+
+
+# Raised when a dump contains something that isn’t understood as SQL values
+class DumpSyntaxError(Exception):
+    pass
+
+
+# Replace the escape sequences of a MySQL string with the characters they represent
+def unescape(string: str) -> str:
+    if "\\" not in string and "''" not in string:
+        return string
+    return ESCAPE.sub(
+        lambda m: "'" if m.group(1) is None else ESCAPES.get(m.group(1), m.group(1)),
+        string,
+    )
+
+
+# Streams the rows of some tables of a mysqldump file, keeping in memory only the
+# line being read, as a dump has one insert statement of rows per line
+class DumpReader:
+    def __init__(self, path: str, tables: tuple[str, ...], encoding: str = "utf-8"):
+        self.path: str = expanduser(path)
+        self.tables: tuple[str, ...] = tables  # Names of the tables to read
+        self.encoding: str = encoding  # Of the dump, as set by mysqldump’s charset
+        # Columns names of each table, in the order of the values in insert statements
+        self.columns: dict[str, tuple[str, ...]] = {}
+
+    # Open the dump, failing on bytes that aren’t of its encoding instead of
+    # replacing them, as a wrong encoding would corrupt every non-ASCII character
+    def open(self) -> IO[str]:
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "rt", encoding=self.encoding)
+        return open(self.path, encoding=self.encoding)
+
+    # Parse the values of the rows in line, appending each of them to rows, and
+    # return the eventually unfinished end of line and if the statement is finished
+    @staticmethod
+    def parse_rows(
+        line: str, rows: list[Row], encoding: str = "utf-8"
+    ) -> tuple[str, bool]:
+        pos: int = 0
+        end: int = len(line)
+        while True:
+            # Skip separators between rows
+            while pos < end and line[pos] in " ,\r\n\t":
+                pos += 1
+            if pos >= end:
+                return "", False
+            if line[pos] == ";":
+                return "", True
+            if line[pos] != "(":
+                raise DumpSyntaxError(f"Expected a row at: {line[pos:pos + 40]}")
+            start: int = pos
+            pos += 1
+            row: list[Any] = []
+            while True:
+                m = VALUE.match(line, pos)
+                if m is None:
+                    # A string with a line break continues on the next line
+                    if UNFINISHED.match(line, pos) or line[pos:].strip() == "":
+                        return line[start:], False
+                    raise DumpSyntaxError(f"Unknown value at: {line[pos:pos + 40]}")
+                string, null, number, hexa, binary, separator = m.groups()
+                if string is not None:
+                    row.append(unescape(string))
+                elif binary is not None:
+                    row.append(unescape(binary))
+                elif null is not None:
+                    row.append(None)
+                elif hexa is not None:
+                    row.append(bytes.fromhex(hexa).decode(encoding))
+                elif "." in number or "e" in number or "E" in number:
+                    row.append(float(number))
+                else:
+                    row.append(int(number))
+                pos = m.end()
+                if separator == ")":
+                    break
+            rows.append(tuple(row))
+
+    # Get column names from the lines of a CREATE TABLE statement
+    def read_columns(self, table: str, dump: IO[str]) -> None:
+        columns: list[str] = []
+        for line in dump:
+            if line.startswith(")"):
+                break
+            m = COLUMN_DEFINITION.match(line)
+            if m is not None:
+                columns.append(m.group(1))
+        self.columns[table] = tuple(columns)
+        LOG.debug(f"Found {len(columns)} columns of {table}")
+
+    # Yield (table, columns, rows) for each batch of rows of self.tables in the dump
+    def read(self) -> Iterator[tuple[str, tuple[str, ...], list[Row]]]:
+        try:
+            yield from self.read_statements()
+        except UnicodeDecodeError as err:
+            raise DumpSyntaxError(
+                f"{self.path} isn’t encoded in {self.encoding}, set dump_encoding to"
+                + f" the charset it was dumped with: {err}"
+            ) from err
+
+    def read_statements(self) -> Iterator[tuple[str, tuple[str, ...], list[Row]]]:
+        with self.open() as dump:
+            table: Optional[str] = None  # Table of the insert statement being read
+            skip: bool = False  # If the current statement is about another table
+            pending: str = ""  # Unfinished row continuing on next line
+            columns: tuple[str, ...] = ()
+            for line in dump:
+                if table is None:
+                    m = CREATE_TABLE.match(line)
+                    if m is not None:
+                        if m.group(1) in self.tables:
+                            self.read_columns(m.group(1), dump)
+                        continue
+                    m = INSERT_INTO.match(line)
+                    if m is None:
+                        continue
+                    table = m.group(1)
+                    skip = table not in self.tables
+                    if not skip:
+                        if m.group(2) is not None:
+                            columns = tuple(
+                                c.strip(' `"') for c in m.group(2).split(",")
+                            )
+                        elif table in self.columns:
+                            columns = self.columns[table]
+                        else:
+                            raise DumpSyntaxError(f"Unknown columns of table {table}")
+                    line = line[m.end() :]
+                if skip:
+                    # Statements of other tables end with the line ending with );
+                    if line.rstrip().endswith(");"):
+                        table = None
+                    continue
+                rows: list[Row] = []
+                pending, finished = self.parse_rows(pending + line, rows, self.encoding)
+                if len(rows) > 0:
+                    yield table, columns, rows
+                if finished:
+                    table = None
@@ -0,0 +1,379 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from filecmp import cmp
+from hashlib import sha256
+from os import link, listdir, readlink, remove, rmdir, stat, symlink, utime, walk
+from os.path import (
+    abspath,
+    basename,
+    dirname,
+    getmtime,
+    getsize,
+    isdir,
+    isfile,
+    islink,
+    join,
+    lexists,
+    normpath,
+    relpath,
+    samefile,
+)
+from shutil import copyfile
+from threading import BoundedSemaphore
+from typing import Any, Callable, Optional
+
+from spip2md.config import CFG, NAME
+from spip2md.style import BOLD, esc
+
+try:  # Only on Linux
+    from os import copy_file_range
+except ImportError:
+    copy_file_range = None
+try:  # Only on Unix
+    from fcntl import ioctl
+except ImportError:
+    ioctl = None
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".output")
+
+
+# Number of bytes read at once when hashing files
+HASH_CHUNK_SIZE = 1024**2
+# Linux ioctl making a file share the blocks of another, on filesystems like Btrfs/XFS
+FICLONE = 0x40049409
+
+
+# Function reporting the error of a file written in background
+Reporter = Callable[[Exception], Any]
+
+
+# Remove empty subdirectories of directory, returning if it’s now empty
+def remove_empty_directories(directory: str) -> bool:
+    empty: bool = True
+    for name in listdir(directory):
+        path: str = join(directory, name)
+        if isdir(path) and remove_empty_directories(path):
+            rmdir(path)
+        else:
+            empty = False
+    return empty
+
+
+# Copy the file at src to dest without reading it in Python: by sharing its blocks if
+# reflink & the filesystem supports it, otherwise with copy_file_range, falling back
+# to shutil.copyfile that uses sendfile. Modification time is copied, for the next
+# exports to see that dest is already a copy of src
+def copy_file(src: str, dest: str, reflink: bool = False) -> None:
+    copied: bool = False
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        if reflink and ioctl is not None:
+            try:
+                ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+                copied = True
+            except OSError:  # Not supported by filesystem, or across filesystems
+                pass
+        if not copied and copy_file_range is not None:
+            size: int = stat(fsrc.fileno()).st_size
+            done: int = 0
+            try:
+                while done < size:
+                    length: int = copy_file_range(
+                        fsrc.fileno(), fdest.fileno(), size - done
+                    )
+                    if length == 0:
+                        break
+                    done += length
+                copied = done == size
+            except OSError:  # Not supported by filesystem, or across filesystems
+                pass
+    if not copied:
+        copyfile(src, dest)
+    src_stat = stat(src)
+    utime(dest, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+# Stage through which every file of the export is written. If opened, files already
+# in the output directory are only rewritten if their content changed, so that the
+# unchanged ones keep their modification time, and the ones this export didn’t write
+# are removed at the end instead of clearing the output directory at the beginning.
+# If started, files are written & copied in background threads while the next objects
+# are converted, directories still being made by the exporting thread, as the
+# directory of an object depends on the files already in it
+class OutputStage:
+    def __init__(self):
+        self.enabled: bool = False
+        self.previous: set[str] = set()  # Files in output dir before this export
+        self.kept: set[str] = set()  # Files written or left unchanged by this export
+        self.written: int = 0
+        self.unchanged: int = 0
+        self.removed: int = 0
+        # Path of the first copy of documents, by hash of their content
+        self.stored: dict[str, str] = {}
+        self.digests: dict[str, str] = {}  # Hash of the content of source files
+        self.deduplicated: int = 0  # Documents that weren’t copied again
+        self.saved: int = 0  # Bytes that weren’t copied again
+        self.fallback: bool = False  # If copy strategy failed & files were copied
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.slots: Optional[BoundedSemaphore] = None  # Room left in queue of files
+        # Files being written in background, with what reports their errors
+        self.pending: dict[str, tuple[Future[Optional[bool]], Reporter]] = {}
+        self.errors: list[tuple[Reporter, Exception]] = []
+
+    # List the files already in directory
+    def open(self, directory: str) -> None:
+        self.enabled = True
+        for root, _, files in walk(directory):
+            self.previous.update(normpath(join(root, name)) for name in files)
+        LOG.debug(f"{len(self.previous)} files already in {directory}")
+
+    # Tell if file at path exists & was written by this export, files of previous
+    # exports being considered absent until this one writes them again
+    def exists(self, path: str) -> bool:
+        path = normpath(path)
+        return isfile(path) and (path not in self.previous or path in self.kept)
+
+    # Names of the files in directory that were written by this export, or are being
+    def files(self, directory: str) -> list[str]:
+        return [
+            name for name in listdir(directory) if self.exists(directory + name)
+        ] + [basename(p) for p in self.pending if dirname(p) == normpath(directory)]
+
+    # Tell if file at path was in output dir before & record that it’s in this export
+    def keep(self, path: str) -> bool:
+        path = normpath(path)
+        self.kept.add(path)
+        return path in self.previous
+
+    # Start threads writing files in background, doing nothing if there are none.
+    # When queue_size files are waiting to be written, the export waits for one
+    def start(self, threads: int, queue_size: int) -> None:
+        if threads < 1:
+            return
+        LOG.debug(f"Start {threads} writer threads")
+        self.executor = ThreadPoolExecutor(threads, NAME + "-writer")
+        self.slots = BoundedSemaphore(max(threads, queue_size))
+
+    # Make fn(*args) write the file at path, in background if started, fn returning
+    # if it wrote the file or found it already written. Errors in background are
+    # passed to report at flush
+    def run(
+        self, path: str, report: Reporter, fn: Callable[..., Optional[bool]], *args
+    ) -> None:
+        if self.executor is None or self.slots is None:
+            self.count(fn(*args))
+            return
+        slots: BoundedSemaphore = self.slots
+        slots.acquire()  # Wait for room in the queue
+        future: Future[Optional[bool]] = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: slots.release())
+        self.pending[normpath(path)] = (future, report)
+        # Collect the files that were written in the meantime
+        for done in [p for p, (f, _) in self.pending.items() if f.done()]:
+            self.wait(done)
+
+    # Count a file as written or unchanged, as told by the function that wrote it
+    def count(self, written: Optional[bool]) -> None:
+        if written is True:
+            self.written += 1
+        elif written is False:
+            self.unchanged += 1
+
+    # Wait for the file at path if it’s being written in background
+    def wait(self, path: str) -> None:
+        path = normpath(path)
+        if path not in self.pending:
+            return
+        future, report = self.pending.pop(path)
+        try:
+            self.count(future.result())
+        except Exception as err:
+            LOG.error(f"Failed to write {path}: {err!r}")
+            self.errors.append((report, err))
+
+    # Wait for every file being written in background, then report their errors
+    def flush(self) -> None:
+        for path in list(self.pending):
+            self.wait(path)
+        for report, err in self.errors:
+            report(err)
+        self.errors.clear()
+
+    # Stop writer threads, cancelling the files that weren’t started to be written
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self.pending.clear()
+
+    # Write content into the file at path, unless it already contains it
+    def write(self, path: str, content: str, report: Reporter = print) -> None:
+        self.wait(path)
+        if self.enabled:
+            self.keep(path)
+        self.run(path, report, self.write_file, path, content)
+
+    # Write content into the file at path, returning if it didn’t already contain it
+    def write_file(self, path: str, content: str) -> bool:
+        if self.enabled and normpath(path) in self.previous and isfile(path):
+            with open(path) as f:
+                if f.read() == content:
+                    return False
+        with open(path, "w") as f:
+            f.write(content)
+        return True
+
+    # Put the file at src at dest with CFG.copy_strategy, unless dest is already the
+    # same file, with the same size & modification time, or the same content
+    def copy(self, src: str, dest: str, report: Reporter = print) -> str:
+        self.wait(dest)
+        size: int = getsize(src)  # Fail now if it doesn’t exist, even in background
+        # Links made with another strategy or pointing to a file this export won’t keep
+        # are replaced
+        if islink(dest) and (
+            CFG.copy_strategy != "symlink" or readlink(dest) != abspath(src)
+        ):
+            remove(dest)
+        elif CFG.copy_strategy != "hardlink" and isfile(dest) and samefile(src, dest):
+            remove(dest)
+        compare: bool = False  # If the content of dest has to be compared with src
+        if (
+            (not self.enabled or self.keep(dest))
+            and isfile(dest)
+            and size == getsize(dest)
+        ):
+            if getmtime(src) == getmtime(dest):
+                self.unchanged += 1
+                return dest
+            compare = self.enabled
+        if CFG.copy_strategy in ("hardlink", "symlink"):
+            if lexists(dest):
+                remove(dest)
+            try:
+                if CFG.copy_strategy == "symlink":
+                    symlink(abspath(src), dest)
+                else:
+                    link(src, dest)
+                self.written += 1
+                return dest
+            except OSError as err:  # Like across filesystems for hard links
+                if not self.fallback:
+                    LOG.warning(f"Copying files as they can’t be {CFG.copy_strategy}ed")
+                    self.fallback = True
+                LOG.debug(f"Copying {src} to {dest} instead of linking it: {err}")
+        self.run(dest, report, self.put_file, src, dest, compare)
+        return dest
+
+    # Copy the file at src to dest, unless compare & dest has the same content,
+    # returning if it was copied
+    @staticmethod
+    def put_file(src: str, dest: str, compare: bool) -> bool:
+        if compare and cmp(src, dest, False):
+            return False
+        # Don’t write through a link into the file it shares its content with
+        if islink(dest) or (isfile(dest) and stat(dest).st_nlink > 1):
+            remove(dest)
+        copy_file(src, dest, CFG.copy_strategy == "reflink")
+        return True
+
+    # Hash of the content of the file at path
+    def digest(self, path: str) -> str:
+        if path not in self.digests:
+            content = sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    content.update(chunk)
+            self.digests[path] = content.hexdigest()
+        return self.digests[path]
+
+    # Record that a copy of the document at src is at dest, for the next ones to link
+    def store(self, src: str, dest: str) -> None:
+        if CFG.deduplicate_documents is not None:
+            self.stored.setdefault(self.digest(src), normpath(dest))
+
+    # Tell if dest is already a link of the kind of CFG.deduplicate_documents to first
+    @staticmethod
+    def linked(first: str, dest: str) -> bool:
+        if CFG.deduplicate_documents == "symlink":
+            return islink(dest) and readlink(dest) == relpath(first, dirname(dest))
+        return isfile(dest) and not islink(dest) and samefile(first, dest)
+
+    # Copy the document at src to dest, or if CFG.deduplicate_documents, link dest to
+    # the file where a document of the same content was already copied by this export
+    def copy_document(self, src: str, dest: str, report: Reporter = print) -> str:
+        if CFG.deduplicate_documents is None:
+            return self.copy(src, dest, report)
+        digest: str = self.digest(src)
+        first: Optional[str] = self.stored.get(digest)
+        if first is None:
+            self.stored[digest] = normpath(dest)
+            return self.copy(src, dest, report)
+        self.wait(first)  # Link to it once it’s written
+        self.wait(dest)
+        self.deduplicated += 1
+        self.saved += getsize(src)
+        if first == normpath(dest):  # Already copied there, in another language
+            return dest
+        if self.enabled and self.keep(dest) and self.linked(first, dest):
+            self.unchanged += 1
+            return dest
+        if lexists(dest):
+            remove(dest)
+        try:
+            if CFG.deduplicate_documents == "symlink":
+                symlink(relpath(first, dirname(dest)), dest)
+            else:
+                link(first, dest)
+        except OSError as err:  # Like with filesystems that don’t support links
+            LOG.warning(f"Copying {src} to {dest} as it can’t be linked: {err}")
+            self.deduplicated -= 1
+            self.saved -= getsize(src)
+            return self.copy(src, dest, report)
+        self.written += 1
+        return dest
+
+    # Remove the files of previous exports that this one didn’t write, if the output
+    # dir would have been cleared, then the directories left empty
+    def close(self) -> None:
+        if CFG.clear_output:
+            for path in sorted(self.previous - self.kept):
+                if lexists(path):
+                    LOG.debug(f"Remove {path} that this export didn’t write")
+                    remove(path)
+                    self.removed += 1
+            remove_empty_directories(CFG.output_dir)
+        self.enabled = False
+
+    # Print how many files were written, and how many didn’t need to be
+    def report(self) -> None:
+        print(
+            f"Output files: {esc(BOLD)}{self.written}{esc()} written,"
+            + f" {esc(BOLD)}{self.unchanged}{esc()} unchanged,"
+            + f" {esc(BOLD)}{self.removed}{esc()} removed"
+        )
+
+    # Print how many documents were linked instead of copied
+    def report_deduplication(self) -> None:
+        print(
+            f"Deduplicated documents: {esc(BOLD)}{self.deduplicated}{esc()} not"
+            + f" copied again, {esc(BOLD)}{self.saved / 1024**2:.1f}{esc()} MB saved"
+        )
+
+
+# Global output stage, only opened if CFG.write_changed_only
+OUTPUT = OutputStage()
@@ -0,0 +1,128 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+from spip2md.config import CFG, NAME
+from spip2md.style import BOLD, esc
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".parallel")
+
+# Number of objects submitted ahead of the one being written, by worker
+WINDOW_BY_WORKER = 8
+
+T = TypeVar("T")
+
+
+# Set up a worker process with the configuration of the exporting one, and logs left
+# to the exporting process, that replays the warnings of conversions. Workers don’t
+# need the database, as they are given the fields to convert
+def init_worker(config: dict[str, Any]) -> None:
+    for name, value in config.items():
+        setattr(CFG, name, value)
+    logging.getLogger(NAME).addHandler(logging.NullHandler())
+    logging.getLogger(NAME).propagate = False
+
+
+# Pool of worker processes converting the fields of objects ahead of their writing.
+# Objects are still written one at a time & in order by the exporting process, that
+# finds the fields to convert (translating them & replacing their internal links)
+# and looks up the conversions made by workers instead of making them itself
+class ConversionPool:
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.window: int = 0  # Number of objects submitted ahead
+        self.hits: int = 0  # Conversions found among the ones made by workers
+        self.misses: int = 0  # Conversions that workers couldn’t make ahead
+
+    @property
+    def enabled(self) -> bool:
+        return self.executor is not None
+
+    # Start workers processes, doing nothing if there are less than 2 of them
+    def start(self, workers: int) -> None:
+        if workers < 2:
+            return
+        LOG.debug(f"Start {workers} conversion workers")
+        self.window = WINDOW_BY_WORKER * workers
+        self.executor = ProcessPoolExecutor(
+            workers,
+            # Fresh processes, not sharing the connections of the exporting one
+            get_context("spawn"),
+            initializer=init_worker,
+            initargs=(vars(CFG),),
+        )
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    # Yield each object of objects in order, along with the result of the call
+    # task(object) = (fn, *args) made by a worker, or None for objects without task
+    # or if it failed. Objects are submitted by window in decreasing size, so that
+    # the largest don’t delay the writing of the others
+    def ahead(
+        self,
+        objects: Iterable[T],
+        task: Callable[[T], Optional[tuple[Any, ...]]],
+        size: Callable[[T], int],
+    ) -> Iterator[tuple[T, Any]]:
+        if self.executor is None:
+            for obj in objects:
+                yield obj, None
+            return
+        iterator: Iterator[T] = iter(objects)
+        pending: deque[tuple[T, Optional[Future[Any]]]] = deque()
+        while True:
+            # Submit a new window when half of the previous one was yielded
+            if len(pending) <= self.window // 2:
+                window: list[T] = list(islice(iterator, self.window - len(pending)))
+                tasks = [task(obj) for obj in window]
+                futures: dict[int, Future[Any]] = {}
+                for i in sorted(range(len(window)), key=lambda i: -size(window[i])):
+                    obj_task = tasks[i]
+                    if obj_task is not None:
+                        futures[i] = self.executor.submit(*obj_task)
+                pending.extend((obj, futures.get(i)) for i, obj in enumerate(window))
+            if len(pending) == 0:
+                return
+            obj, future = pending.popleft()
+            result: Any = None
+            if future is not None:
+                try:
+                    result = future.result()
+                except Exception as err:  # The exporting process will convert it
+                    LOG.warning(f"Conversion worker failed: {err!r}")
+            yield obj, result
+
+    # Print how many conversions were made by workers
+    def report(self) -> None:
+        lookups: int = self.hits + self.misses
+        rate: float = 100 * self.hits / lookups if lookups > 0 else 0
+        print(
+            f"Conversions made by workers: {esc(BOLD)}{self.hits}{esc()} used,"
+            + f" {esc(BOLD)}{self.misses}{esc()} remade ({rate:.0f}% used)"
+        )
+
+
+# Global pool of conversion workers, only started if CFG.workers > 1
+POOL = ConversionPool()
@@ -0,0 +1,129 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from typing import Any
+
+from spip2md.config import NAME
+from spip2md.spip_models import (
+    SpipArticles,
+    SpipAuteurs,
+    SpipAuteursLiens,
+    SpipDocuments,
+    SpipDocumentsLiens,
+    SpipMots,
+    SpipMotsLiens,
+    SpipRubriques,
+)
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".preload")
+
+Row = dict[str, Any]  # A row of a table, as returned by peewee’s .dicts()
+Link = tuple[str, int]  # (objet, id_objet) identifying an object in *_liens tables
+
+
+# In-memory copy of the SPIP tables needed by the export, indexed by IDs so that
+# models can answer their children & links queries without the database
+class Preload:
+    loaded: bool = False
+
+    def __init__(self):
+        # Rows of redactional objects and documents, by their own ID
+        self.articles: dict[int, Row] = {}
+        self.sections: dict[int, Row] = {}
+        self.documents: dict[int, Row] = {}
+        # Children rows, ordered by date descending like model queries
+        self.section_articles: dict[int, list[Row]] = {}  # By id_rubrique
+        self.section_sections: dict[int, list[Row]] = {}  # By id_parent
+        # Linked objects, by (objet, id_objet) of the object they are linked to
+        self.linked_documents: dict[Link, list[Row]] = {}
+        self.linked_authors: dict[Link, list[SpipAuteurs]] = {}
+        self.linked_taxonomies: dict[Link, list[SpipMots]] = {}
+
+    # Index rows by the value of one of their fields
+    @staticmethod
+    def group_by(rows: list[Row], field: str) -> dict[int, list[Row]]:
+        groups: dict[int, list[Row]] = {}
+        for row in rows:
+            groups.setdefault(row[field], []).append(row)
+        return groups
+
+    # Index objects by the (objet, id_objet) of the *_liens rows pointing at them,
+    # in the order of links, that is by ID of object like relations queries
+    @staticmethod
+    def group_links(links: list[Row], key: str, objects: dict[int, Any]) -> dict:
+        groups: dict[Link, list[Any]] = {}
+        for link in links:
+            obj = objects.get(link[key])
+            if obj is not None:  # Ignore links to objects that don’t exist anymore
+                groups.setdefault((link["objet"], link["id_objet"]), []).append(obj)
+        return groups
+
+    # Read every needed table with one query each and build the indexes
+    def load(self) -> None:
+        LOG.debug("Preload sections")
+        sections: list[Row] = list(
+            SpipRubriques.select().order_by(SpipRubriques.date.desc()).dicts()
+        )
+        self.sections = {row["id_rubrique"]: row for row in sections}
+        self.section_sections = self.group_by(sections, "id_parent")
+
+        LOG.debug("Preload articles")
+        articles: list[Row] = list(
+            SpipArticles.select().order_by(SpipArticles.date.desc()).dicts()
+        )
+        self.articles = {row["id_article"]: row for row in articles}
+        self.section_articles = self.group_by(articles, "id_rubrique")
+
+        LOG.debug("Preload documents")
+        self.documents = {
+            row["id_document"]: row for row in SpipDocuments.select().dicts()
+        }
+        self.linked_documents = self.group_links(
+            list(
+                SpipDocumentsLiens.select()
+                .order_by(SpipDocumentsLiens.id_document)
+                .dicts()
+            ),
+            "id_document",
+            self.documents,
+        )
+
+        LOG.debug("Preload authors")
+        self.linked_authors = self.group_links(
+            list(
+                SpipAuteursLiens.select().order_by(SpipAuteursLiens.id_auteur).dicts()
+            ),
+            "id_auteur",
+            {author.id_auteur: author for author in SpipAuteurs.select()},
+        )
+
+        LOG.debug("Preload taxonomies")
+        self.linked_taxonomies = self.group_links(
+            list(SpipMotsLiens.select().order_by(SpipMotsLiens.id_mot).dicts()),
+            "id_mot",
+            {tag.id_mot: tag for tag in SpipMots.select()},
+        )
+
+        self.loaded = True
+        LOG.info(
+            f"Preloaded {len(self.sections)} sections, {len(self.articles)} articles"
+            + f" and {len(self.documents)} documents"
+        )
+
+
+# Global preloaded tables, only filled if CFG.preload
+PRELOAD = Preload()
@@ -0,0 +1,162 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from re import compile
+from sys import _getframe
+from time import perf_counter
+from types import FrameType
+from typing import Any, Callable, Iterator, Optional
+
+from peewee import Database
+
+from spip2md.config import NAME
+from spip2md.style import BOLD, WARNING_STYLE, esc
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".profiler")
+
+# Lists of placeholders of IN clauses, which length varies between same queries
+PLACEHOLDERS = compile(r"\((?:\?|%s)(?:, *(?:\?|%s))*\)")
+# Number of different parameters from which a query shape is an N+1 candidate
+N_PLUS_ONE: int = 10
+# Number of spip2md functions of the call stack to which queries are attributed
+CALLER_DEPTH: int = 2
+
+
+# Statistics of the queries of one shape, made from one caller
+class QueryStats:
+    def __init__(self):
+        self.count: int = 0  # Number of executions
+        self.time: float = 0.0  # Total time spent executing & fetching, in seconds
+        self.rows: int = 0  # Total number of fetched rows
+        self.params: set[int] = set()  # Hashes of the different parameters
+
+    # Number of times that the exact same query (with same parameters) was repeated
+    def duplicates(self) -> int:
+        return self.count - len(self.params)
+
+
+# Cursor counting the rows fetched from it & the time spent fetching them
+class ProfiledCursor:
+    def __init__(self, cursor: Any, stats: QueryStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def _fetch(self, method: Callable[..., Any], *args: Any) -> Any:
+        start: float = perf_counter()
+        rows = method(*args)
+        self._stats.time += perf_counter() - start
+        return rows
+
+    def fetchone(self) -> Any:
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args: Any) -> list[Any]:
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        rows = self._fetch(self._cursor.fetchall)
+        self._stats.rows += len(rows)
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+# Records the queries made to a database, by shape & by the code that made them
+class QueryProfiler:
+    def __init__(self):
+        self.stats: dict[tuple[str, str], QueryStats] = {}  # By (caller, shape)
+
+    # Get the shape of a query, its SQL without the varying length of IN lists
+    @staticmethod
+    def shape(sql: str) -> str:
+        return PLACEHOLDERS.sub("(?…)", sql)
+
+    # Get the spip2md functions that made the query, innermost first
+    @staticmethod
+    def caller(frame: Optional[FrameType]) -> str:
+        callers: list[str] = []
+        while frame is not None and len(callers) < CALLER_DEPTH:
+            module: str = frame.f_globals.get("__name__", "")
+            if module.startswith(NAME) and module != __name__:
+                code = frame.f_code
+                callers.append(getattr(code, "co_qualname", code.co_name))
+            frame = frame.f_back
+        return " < ".join(callers) if len(callers) > 0 else "unknown"
+
+    # Record every query executed by db from now on
+    def install(self, db: Database) -> None:
+        execute_sql = db.execute_sql
+
+        def profiled_execute_sql(sql: str, params: Any = None, *args: Any) -> Any:
+            key = (self.caller(_getframe(1)), self.shape(sql))
+            stats: QueryStats = self.stats.setdefault(key, QueryStats())
+            start: float = perf_counter()
+            cursor = execute_sql(sql, params, *args)
+            stats.time += perf_counter() - start
+            stats.count += 1
+            stats.params.add(hash(tuple(params or ())))
+            return ProfiledCursor(cursor, stats)
+
+        # peewee calls execute_sql on the database instance, so shadow the method
+        db.execute_sql = profiled_execute_sql  # type: ignore
+        LOG.debug(f"Profiling queries of {db}")
+
+    # Print the top queries by total time & the N+1 candidates, and return the text
+    def report(self, top: int = 10) -> str:
+        count: int = sum(s.count for s in self.stats.values())
+        time: float = sum(s.time for s in self.stats.values())
+        lines: list[str] = [
+            f"Made {esc(BOLD)}{count}{esc()} queries in {esc(BOLD)}{time:.3f}s{esc()}"
+            + f", top {top} query shapes by total time:"
+        ]
+        ranked = sorted(self.stats.items(), key=lambda i: i[1].time, reverse=True)
+        for i, ((caller, shape), stats) in enumerate(ranked[:top]):
+            lines.append(
+                f"  {i + 1}. {esc(BOLD)}{stats.time:.3f}s{esc()}, {stats.count}"
+                + f" queries, {stats.rows} rows, from {esc(BOLD)}{caller}{esc()}:"
+                + f" {shape[:100]}"
+            )
+        # Same shape of query made from the same place for many different objects
+        for (caller, shape), stats in ranked:
+            if len(stats.params) >= N_PLUS_ONE:
+                lines.append(
+                    f"{esc(*WARNING_STYLE)}Possible N+1{esc()}: {esc(BOLD)}{caller}"
+                    + f"{esc()} made {len(stats.params)} queries differing only by"
+                    + f" their parameters: {shape[:100]}"
+                )
+            if stats.duplicates() > 0:
+                lines.append(
+                    f"{esc(*WARNING_STYLE)}Repeated{esc()}: {esc(BOLD)}{caller}"
+                    + f"{esc()} made {stats.duplicates()} queries identical to"
+                    + f" previous ones: {shape[:100]}"
+                )
+        report: str = "\n".join(lines)
+        print(report)
+        return report
+
+
+# Global queries profiler, only installed if CFG.profile_queries
+PROFILER = QueryProfiler()
@@ -14,7 +14,8 @@ You should have received a copy of the GNU General Public License along with spi
 If not, see <https://www.gnu.org/licenses/>.
 """
 # pyright: strict
-from re import I, S, compile
+from re import I, S, compile, escape
+from typing import Iterable
 
 from spip2md.config import CFG
 
@@ -159,19 +160,35 @@ SECTION_LINK = (
     compile(r"\[(.*?)\]\((?:rub|rubrique)([0-9]+)(?:\|(.*?))?\)", S | I),
 )
 
+# Kind & ID of the targets of every internal link or embed, found by the patterns above
+LINK_TARGET = compile(
+    r"(?:<|->|\]\() *(doc|document|emb|embed|img|image|art|article|rub|rubrique)"
+    + r"([0-9]+)",
+    I,
+)
+# Objet of the targets of internal links by their kind
+LINK_TARGET_OBJETS = {
+    "doc": "document",
+    "document": "document",
+    "emb": "document",
+    "embed": "document",
+    "img": "document",
+    "image": "document",
+    "art": "article",
+    "article": "article",
+    "rub": "rubrique",
+    "rubrique": "rubrique",
+}
+
 # LINK_REPL = r"[{}]({})"  # Name and path can be further replaced with .format()
 # IMAGE_REPL = r"![{}]({})"  # Name and path can be further replaced with .format()
 
 
 # Multi language block, to be further processed per lang
 MULTILANG_BLOCK = compile(r"<multi>(.+?)<\/multi>", S | I)
-CONFIG_LANGS = {  # lang of configuration: (match against this lang)
-    lang: compile(r"\[ *" + lang + r" *\]\s*(.+?)\s*(?=\[[a-zA-Z\-]{2,6}\]|$)", S | I)
-    for lang in CFG.export_languages
-}
-# MULTILANGS = compile(  # Matches agains all langs of multi blocks
-#     r"\[([a-zA-Z\-]{2,6})\]\s*(.+?)\s*(?=\[[a-zA-Z\-]{2,6}\]|$)", S | I
-# )
+MULTILANG_MARKER = compile(r"\[ *([a-zA-Z\-]{2,6}) *\]")  # Lang of the text after
+# Text following a lang marker, up to the next marker
+MULTILANG_TEXT = compile(r"\s*(.+?)\s*(?=\[[a-zA-Z\-]{2,6}\]|$)", S)
 
 # WARNING probably useless text in metadata fields, to be removed
 BLOAT = (
@@ -304,11 +321,53 @@ ISO_UTF = (
     ),
 )
 
+
+# Tree of characters, each word ending with an empty string
+Trie = dict[str, "Trie"]
+
+
+# Get a pattern matching any of words, as a trie of their common prefixes, so that a
+# single character is tested at positions where none of them can begin
+def trie_pattern(words: Iterable[str]) -> str:
+    trie: Trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # Mark the end of a word
+
+    def pattern(node: Trie) -> str:
+        branches = [escape(char) + pattern(sub) for char, sub in node.items() if char]
+        if len(branches) == 0:
+            return ""
+        optional: str = "?" if "" in node else ""
+        if len(branches) == 1 and optional == "":
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + optional
+
+    return pattern(trie)
+
+
+# Matches any broken encoding of ISO_UTF, in one scan as none of them overlap
+ISO_UTF_PATTERN = compile(trie_pattern(broken for broken, _ in ISO_UTF))
+# Proper UTF equivalent of each broken encoding of ISO_UTF
+ISO_UTF_REPAIRS: dict[str, str] = dict(ISO_UTF)
+# Repaired characters that can be part of another broken encoding of ISO_UTF
+ISO_UTF_CHAINING = frozenset(
+    utf for _, utf in ISO_UTF if any(c in "".join(ISO_UTF_REPAIRS) for c in utf)
+)
+# Broken encodings of ISO_UTF that can be found in pure ASCII text
+ISO_UTF_ASCII = tuple((broken, utf) for broken, utf in ISO_UTF if broken.isascii())
+
 # WARNING broken ISO 8859-1 encoding which I don’t know the UTF equivalent
 UNKNOWN_ISO = (
     "â€¨",
     "âˆ†",
 )
+# Matches runs of any of the unknown broken encodings of UNKNOWN_ISO
+UNKNOWN_ISO_PATTERN = compile(
+    "|".join(f"(?:{escape(unknown)})+" for unknown in UNKNOWN_ISO)
+)
 
 
 # Special elements in terminal output to surround
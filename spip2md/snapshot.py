@@ -0,0 +1,203 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+from datetime import date
+from os.path import expanduser
+from typing import Any, Iterator, Optional
+
+from peewee import AutoField, Field, Model, SqliteDatabase, fn
+
+from spip2md.config import CFG, NAME
+from spip2md.database import SOURCE_MODELS, create_sqlite_tables
+from spip2md.spip_models import (
+    DB,
+    SpipArticles,
+    SpipAuteurs,
+    SpipAuteursLiens,
+    SpipDocuments,
+    SpipDocumentsLiens,
+    SpipMots,
+    SpipMotsLiens,
+    SpipRubriques,
+)
+from spip2md.style import BOLD, esc
+
+# Define logger for this file’s logs
+LOG = logging.getLogger(NAME + ".snapshot")
+
+# Table of the snapshot in which the last modification date of each table is stored
+SNAPSHOT_TABLE = "spip2md_snapshot"
+# Number of rows copied at once
+SNAPSHOT_BATCH = 1000
+
+# Columns read by the exporter, that are copied into the snapshot. Other columns of
+# the models are left to their default values
+SNAPSHOT_COLUMNS: dict[type[Model], tuple[str, ...]] = {
+    SpipRubriques: (
+        "id_rubrique",
+        "id_parent",
+        "id_secteur",
+        "id_trad",
+        "titre",
+        "descriptif",
+        "texte",
+        "extra",
+        "lang",
+        "langue_choisie",
+        "statut",
+        "date",
+        "maj",
+        "profondeur",
+    ),
+    SpipArticles: (
+        "id_article",
+        "id_rubrique",
+        "id_secteur",
+        "id_trad",
+        "surtitre",
+        "titre",
+        "soustitre",
+        "chapo",
+        "texte",
+        "ps",
+        "microblog",
+        "descriptif",
+        "extra",
+        "lang",
+        "langue_choisie",
+        "statut",
+        "date",
+        "date_redac",
+        "maj",
+        "accepter_forum",
+    ),
+    SpipDocuments: ("id_document", "titre", "descriptif", "fichier", "statut", "maj"),
+    SpipDocumentsLiens: ("id_document", "id_objet", "objet"),
+    SpipAuteurs: ("id_auteur", "nom", "maj"),
+    SpipAuteursLiens: ("id_auteur", "id_objet", "objet"),
+    SpipMots: ("id_mot", "type", "descriptif", "maj"),
+    SpipMotsLiens: ("id_mot", "id_objet", "objet"),
+}
+
+
+# Convert values that SQLite can’t store as is
+def sqlite_value(value: Any) -> Any:
+    if isinstance(value, date):  # Also matches datetimes
+        return str(value)
+    return value
+
+
+# Yield batches of the rows of fields of model, modified since maj if given,
+# paginating on the primary key so that a single batch is in memory at once
+def source_rows(
+    model: type[Model], fields: list[Field], maj: Optional[str] = None
+) -> Iterator[list[tuple[Any, ...]]]:
+    query = model.select(*fields)
+    if maj is not None:
+        # Rows modified during the second of the previous snapshot are copied again
+        query = query.where(model.maj >= maj)
+    key: Field = model._meta.primary_key
+    if not isinstance(key, AutoField):  # *_liens tables are small, read at once
+        # In the order of their composite key, whatever the order of source rows
+        query = query.order_by(*(model._meta.fields[f] for f in key.field_names))
+        yield [tuple(map(sqlite_value, row)) for row in query.tuples()]
+        return
+    last: int = -1
+    while True:
+        rows = [
+            tuple(map(sqlite_value, row))
+            for row in query.where(key > last)
+            .order_by(key)
+            .limit(SNAPSHOT_BATCH)
+            .tuples()
+        ]
+        if len(rows) == 0:
+            return
+        yield rows
+        last = rows[-1][fields.index(key)]
+
+
+# Copy the SOURCE_MODELS tables of DB into a SQLite database at CFG.db_snapshot, or
+# if it already exists, copy only rows that were modified since the last snapshot
+def snapshot() -> dict[str, int]:
+    path: str = expanduser(CFG.db_snapshot)
+    dest = SqliteDatabase(path)
+    counter: dict[str, int] = {}
+    with dest:
+        create_sqlite_tables(dest)
+        dest.execute_sql(
+            f'CREATE TABLE IF NOT EXISTS "{SNAPSHOT_TABLE}"'
+            + ' ("table_name" TEXT PRIMARY KEY, "maj" TEXT)'
+        )
+        marks: dict[str, str] = dict(
+            dest.execute_sql(f'SELECT "table_name", "maj" FROM "{SNAPSHOT_TABLE}"')
+        )
+        for model in SOURCE_MODELS:
+            table: str = model._meta.table_name
+            columns: tuple[str, ...] = SNAPSHOT_COLUMNS[model]
+            fields: list[Field] = [model._meta.fields[c] for c in columns]
+            incremental: bool = "maj" in columns and table in marks
+            maj: Optional[Any] = None
+            LOG.info(f"Copy {table} rows modified since {marks.get(table)}")
+            # Next high-water mark, read before copying so no change can be missed
+            if "maj" in columns:
+                maj = model.select(fn.MAX(model.maj)).scalar()
+            if not incremental:  # Tables without modification date are copied again
+                dest.execute_sql(f'DELETE FROM "{table}"')
+            counter[table] = 0
+            for rows in source_rows(
+                model, fields, marks[table] if incremental else None
+            ):
+                dest.cursor().executemany(
+                    f'INSERT OR REPLACE INTO "{table}"'
+                    + f""" ({", ".join(f'"{c}"' for c in columns)})"""
+                    + f" VALUES ({', '.join('?' for _ in columns)})",
+                    rows,
+                )
+                counter[table] += len(rows)
+            if incremental:
+                # Remove rows that were deleted from source since last snapshot
+                key: Field = model._meta.primary_key
+                ids: set[int] = {i for (i,) in model.select(key).tuples()}
+                removed: list[tuple[int]] = [
+                    (i,)
+                    for (i,) in dest.execute_sql(
+                        f'SELECT "{key.column_name}" FROM "{table}"'
+                    )
+                    if i not in ids
+                ]
+                dest.cursor().executemany(
+                    f'DELETE FROM "{table}" WHERE "{key.column_name}" = ?', removed
+                )
+            if maj is not None:
+                dest.execute_sql(
+                    f'INSERT OR REPLACE INTO "{SNAPSHOT_TABLE}" VALUES (?, ?)',
+                    (table, sqlite_value(maj)),
+                )
+    return counter
+
+
+# Take a snapshot of DB & print what was copied
+def write_snapshot() -> None:
+    print(
+        f"Copy the SPIP tables into {esc(BOLD)}{CFG.db_snapshot}{esc()} local snapshot"
+    )
+    with DB:
+        counter: dict[str, int] = snapshot()
+    totals: str = ""
+    for table, rows in counter.items():
+        totals += f"{esc(BOLD)}{rows}{esc()} {table}, "
+    print(f"Copied a total of {totals[:-2]} rows")
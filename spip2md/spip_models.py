@@ -20,16 +20,16 @@ from peewee import (
     BigIntegerField,
     CharField,
     CompositeKey,
+    DatabaseProxy,
     DateField,
     DateTimeField,
     FloatField,
     IntegerField,
     Model,
-    MySQLDatabase,
     TextField,
 )
 
-DB = MySQLDatabase(None)
+DB = DatabaseProxy()  # Initialized with the chosen data source at runtime
 
 
 # class UnknownField(object):
@@ -39,7 +39,7 @@ DB = MySQLDatabase(None)
 
 class BaseModel(Model):
     class Meta:
-        database: MySQLDatabase = DB
+        database: DatabaseProxy = DB
 
 
 class SpipArticles(BaseModel):
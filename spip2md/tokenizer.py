@@ -0,0 +1,332 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Alternative to the sequential substitutions of regexmaps.SPIP_MARKDOWN, converting
+# SPIP markup to Markdown in a single left to right pass over the text.
+# At each position, tokens are tried in the order of SPIP_MARKDOWN. The content of
+# tokens is converted recursively, and their closing marks are searched at most once
+# per text, so that unclosed marks don’t make the conversion quadratic.
+# The output is NOT always the same as SPIP_MARKDOWN’s, which patterns match the
+# whole output of previous ones. These differences are intended, and
+# tests/test_markup.py checks an example of each, and that the corpus of benchmarks
+# converts alike when SPIP_MARKDOWN doesn’t span several brackets or lines:
+#   - Anchors, wikilinks & tables metadata can’t span several brackets or lines,
+#     while SPIP_MARKDOWN can for example remove the "[" of "<multi>[fr]" when an
+#     anchor follows, or everything between the metadata of two tables
+#   - A closing mark is the first one after the opening mark, even if it’s part of
+#     a token of higher priority that spans over it
+#   - Markdown output is never taken for SPIP markup, like the "-*" of "-{{bold}}"
+#     that SPIP_MARKDOWN converts to a list item
+from re import I, Match, Pattern, compile
+from typing import Optional
+
+# (Name, opening pattern) of tokens, in the order of regexmaps.SPIP_MARKDOWN
+TOKENS: tuple[tuple[str, str], ...] = (
+    ("hr", r"(?P<hr_nl>\r?\n?\r?\n?)- ?- ?- ?- ?[\- ]*\r?\n?\r?\n?|<hr ?[^\n]*?>"),
+    ("br", r"\r?\n_ *(?=\r?\n)|<br ?[^\n]*?>"),
+    ("heading", r"(?P<heading_nl>\r?\n?\r?\n?)\{\{\{ *"),
+    ("strong", r"\{\{ *"),
+    ("html_strong", r"<strong> *"),
+    ("emphasis", r"\{ *"),
+    ("html_emphasis", r"<i> *"),
+    ("strikethrough", r"<del>\s*"),
+    (
+        "anchor",
+        r"\[ *(?P<anchor_text>[^\[\]]*?) *-> *(?P<anchor_url>[^\[\]]*?) *\]",
+    ),
+    ("wikilink", r"\[\? *(?P<wikilink_text>[^\[\]]*?) *\]"),
+    ("footnote", r"\[\[ *"),
+    ("unordered_list", r"(?P<unordered_list_nl>\r?\n)-(?!#|-)\*? *"),
+    ("wrong_unordered_list", r"(?P<wrong_unordered_list_nl>\r?\n)\* +"),
+    ("tag_unordered_list", r"(?P<tag_unordered_list_nl>\r?\n)<[^\n]*?>\* +"),
+    ("ordered_list", r"(?P<ordered_list_nl>\r?\n)-# *"),
+    ("table_metadata", r"(?P<table_metadata_nl>\r?\n)\|\|[^\n]*?\|[^\n]*?\|\|"),
+    ("quote", r"<(?:quote|poesie)>\s*"),
+    ("box", r"<code>\s*"),
+    ("fence", r"<cadre>\s*"),
+)
+RANKS: dict[str, int] = {name: rank for rank, (name, _) in enumerate(TOKENS)}
+# (Name, pattern) of tokens of lines beginning without their leading line break, as
+# they can also begin right after a line break output by another token
+LINE_TOKENS: tuple[tuple[str, str], ...] = (
+    ("br", r"_ *(?=\r?\n)"),
+    ("unordered_list", r"-(?!#|-)\*? *"),
+    ("wrong_unordered_list", r"\* +"),
+    ("tag_unordered_list", r"<[^\n]*?>\* +"),
+    ("ordered_list", r"-# *"),
+    ("table_metadata", r"\|\|[^\n]*?\|[^\n]*?\|\|"),
+)
+
+# Any token, the first matching at the leftmost position being the one to convert
+OPENING: Pattern[str] = compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKENS), I
+)
+# Each token alone, tried in order when the closing mark of another is missing
+OPENINGS: dict[str, Pattern[str]] = {
+    name: compile(pattern, I) for name, pattern in TOKENS
+}
+# Any token of lines beginning
+LINE_OPENING: Pattern[str] = compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in LINE_TOKENS), I
+)
+# Closing marks of tokens with a content, eventually preceded by whitespaces
+CLOSINGS: dict[str, Pattern[str]] = {
+    "heading": compile(r" *\}\}\}\r?\n?\r?\n?"),
+    "strong": compile(r" *\}\} ?"),
+    "html_strong": compile(r" *</strong>", I),
+    "emphasis": compile(r" *\} ?"),
+    "html_emphasis": compile(r" *</i>", I),
+    "strikethrough": compile(r"\s*(?:(\r?\n){2,}|</del>)", I),
+    "footnote": compile(r" *\]\]"),
+    "quote": compile(r"\s*(?:(\r?\n){2,}|</(?:quote|poesie)>)", I),
+    "box": compile(r"\s*(?:(?:\r?\n){2,}|</code>)", I),
+    "fence": compile(r"\s*(?:(?:\r?\n){2,}|</cadre>)", I),
+}
+# Line break at the end or at the beginning of a piece of output
+TRAILING_NEWLINE: Pattern[str] = compile(r"\r?\n\Z")
+LEADING_NEWLINE: Pattern[str] = compile(r"\r?\n")
+# Tokens which output can end with line breaks that they matched, which tokens
+# applied before them by SPIP_MARKDOWN could have matched too
+MATCHED_NEWLINES: tuple[int, ...] = (RANKS["heading"], RANKS["quote"])
+
+
+# Converts a single text, remembering where closing marks were found
+class Tokenizer:
+    def __init__(
+        self, text: str, keep_markup: bool = True, opening: Optional[int] = None
+    ):
+        self.text: str = text
+        self.keep_markup: bool = keep_markup
+        self.output: list[str] = []
+        # Rank of the token that output each piece of output, None for plain text
+        self.sources: list[Optional[int]] = []
+        # For a content, rank of its token if its opening mark ended with a line break
+        self.opening: Optional[int] = opening
+        # (Rank, count) of a token that can still match count line breaks after it
+        self.trailing: Optional[tuple[int, int]] = None
+        # Indexes of output pieces of MATCHED_NEWLINES tokens that matched none
+        self.unmatched: set[int] = set()
+        # (Position from which it was searched, closing match) by token name
+        self.closings: dict[str, tuple[int, Optional[Match[str]]]] = {}
+
+    # Find the first closing mark of token after pos, searching the text once
+    # unless the previously found one is before pos
+    def closing(self, token: str, pos: int) -> Optional[Match[str]]:
+        if token in self.closings:
+            start, m = self.closings[token]
+            if start <= pos and (m is None or m.start() >= pos):
+                return m
+        m = CLOSINGS[token].search(self.text, pos)
+        self.closings[token] = (pos, m)
+        return m
+
+    # Get the source of the first or last non empty piece of output, -1 if none
+    def source(self, last: bool = True) -> Optional[int]:
+        pieces = list(zip(self.output, self.sources))
+        for piece, source in reversed(pieces) if last else pieces:
+            if len(piece) > 0:
+                return source
+        return -1
+
+    # If a line break at the end of output can be matched by the token of rank, as
+    # SPIP_MARKDOWN patterns match the line breaks output by previous patterns, or
+    # matched at the end of the matches of next patterns, but not their own ones
+    def follows(self, rank: int) -> bool:
+        for i in reversed(range(len(self.output))):
+            piece, source = self.output[i], self.sources[i]
+            if len(piece) > 0:
+                return (
+                    source is not None
+                    and (
+                        source < rank
+                        or (source in MATCHED_NEWLINES and i not in self.unmatched)
+                    )
+                    and source != rank
+                    and piece[-1] == "\n"
+                )
+        # At the beginning of a content, its token was applied after this one
+        return self.opening is not None and self.opening > rank
+
+    # Remove up to count line breaks at the end of output, as SPIP_MARKDOWN patterns
+    # beginning with optional line breaks would have matched them
+    def remove_newlines(self, count: int, rank: int) -> None:
+        if not self.follows(rank):
+            return
+        while count > 0 and len(self.output) > 0:
+            m = TRAILING_NEWLINE.search(self.output[-1])
+            if m is None:
+                if len(self.output[-1]) > 0:
+                    return
+                self.output.pop()
+                self.sources.pop()
+                continue
+            self.output[-1] = self.output[-1][: m.start()]
+            count -= 1
+
+    # Append a piece of output, of which the token that output the previous pieces
+    # can match leading line breaks if it was applied after its source
+    def append(self, piece: str, source: Optional[int]) -> None:
+        if self.trailing is not None:
+            rank, count = self.trailing
+            if source is None or source < rank:
+                m = LEADING_NEWLINE.match(piece)
+                while count > 0 and m is not None:
+                    piece = piece[m.end() :]
+                    count -= 1
+                    m = LEADING_NEWLINE.match(piece)
+                if count == 0 or len(piece) > 0:
+                    self.trailing = None
+                else:
+                    self.trailing = (rank, count)
+            else:
+                self.trailing = None
+        self.output.append(piece)
+        self.sources.append(source)
+
+    # Convert the content text[start:end] of the token of rank. As the content of
+    # the tokens that were applied before it is already converted when it’s matched,
+    # their output can be stripped like the content, of spaces or of any whitespace
+    def content(self, start: int, end: int, rank: int, spaces: bool = True) -> str:
+        # A line break matched by the opening mark can still begin the content’s line
+        opening: Optional[int] = None
+        if start > 0 and self.text[start - 1] == "\n":
+            opening = rank
+        tokenizer = Tokenizer(self.text[start:end], self.keep_markup, opening)
+        text: str = tokenizer.convert()
+        chars: Optional[str] = " " if spaces else None
+        first: Optional[int] = tokenizer.source(False)
+        if first is not None and 0 <= first < rank:
+            text = text.lstrip(chars)
+        last: Optional[int] = tokenizer.source()
+        if last is not None and 0 <= last < rank:
+            text = text.rstrip(chars)
+        return text
+
+    # Output the token name matched by m, and return the position after it, or None
+    # if it’s unclosed. If line, m is a token of LINE_OPENING, without line break
+    def token(self, name: str, m: Match[str], line: bool = False) -> Optional[int]:
+        rank: int = RANKS[name]
+        markup: bool = self.keep_markup
+        nl: str = "" if line else (m.groupdict().get(f"{name}_nl") or "")
+        output: str = ""
+        end: int = m.end()
+        if name == "hr":
+            if m.group("hr_nl") is not None:  # Not an html <hr>
+                self.remove_newlines(2 - m.group("hr_nl").count("\n"), rank)
+            output = "\n\n***\n\n" if markup else ""
+        elif name == "br":
+            if line and not markup:  # The line break is replaced with nothing
+                self.remove_newlines(1, rank)
+            output = "\n" if markup and not line else ""
+        elif name == "anchor":
+            text: str = self.content(m.start("anchor_text"), m.end("anchor_text"), rank)
+            output = f"[{text}]({m.group('anchor_url')})" if markup else text
+        elif name == "wikilink":
+            text = self.content(m.start("wikilink_text"), m.end("wikilink_text"), rank)
+            output = f"[{text}](https://wikipedia.org/wiki/{text})" if markup else text
+        elif name in ("unordered_list", "wrong_unordered_list", "tag_unordered_list"):
+            output = nl + "- " if markup else nl
+        elif name == "ordered_list":
+            output = nl + "1. " if markup else nl
+        elif name == "table_metadata":
+            if line and markup:  # The line break that began the line is removed too
+                self.remove_newlines(1, rank)
+            output = "" if markup else nl
+        else:  # Tokens with a content, that are converted only if they’re closed
+            closing = self.closing(name, m.end())
+            if closing is None:
+                return None
+            end = closing.end()
+            if name == "heading":
+                self.remove_newlines(2 - m.group("heading_nl").count("\n"), rank)
+            text = self.content(
+                m.end(),
+                closing.start(),
+                rank,
+                name not in ("strikethrough", "quote", "box", "fence"),
+            )
+            if not markup:
+                output = text
+            elif name == "heading":
+                output = f"\n\n## {text}\n\n"
+            elif name == "strong" or name == "html_strong":
+                output = f"**{text}**" + (" " if name == "strong" else "")
+            elif name == "emphasis" or name == "html_emphasis":
+                output = f"*{text}*" + (" " if name == "emphasis" else "")
+            elif name == "strikethrough":
+                output = f"~{text}~"
+            elif name == "quote":
+                output = f"> {text}" + 2 * (closing.group(1) or "")
+            elif name == "box":
+                output = f"`{text}`"
+            elif name == "fence":
+                output = f"```\n{text}\n\n```"
+        self.append(output, rank)
+        if name == "heading":  # It can match line breaks output after it
+            newlines: int = closing.group().count("\n")
+            nl_start: int = closing.start() + closing.group().index("}}}") + 3
+            # Tokens applied before it matched its line breaks first
+            for other, _ in TOKENS[:rank]:
+                if newlines > 0 and OPENINGS[other].match(self.text, nl_start):
+                    end, newlines = nl_start, 0
+                    self.unmatched.add(len(self.output) - 1)
+                    break
+            self.trailing = (rank, 2 - newlines)
+        return end
+
+    # Try the tokens following the unclosed token name at the position of m
+    def next_token(self, name: str, m: Match[str]) -> Optional[int]:
+        for other, _ in TOKENS[RANKS[name] + 1 :]:
+            n = OPENINGS[other].match(self.text, m.start())
+            if n is not None:
+                end = self.token(other, n)
+                if end is not None:
+                    return end
+        return None
+
+    # Convert the whole text
+    def convert(self) -> str:
+        pos: int = 0
+        end: int = len(self.text)
+        while pos < end:
+            m = OPENING.search(self.text, pos)
+            # Tokens of lines beginning can also follow a line break of the output
+            line = LINE_OPENING.match(self.text, pos)
+            if line is not None and line.lastgroup is not None:
+                if self.follows(RANKS[line.lastgroup]) and (
+                    m is None
+                    or m.start() > pos
+                    or RANKS[line.lastgroup] < RANKS[str(m.lastgroup)]
+                ):
+                    self.token(line.lastgroup, line, True)
+                    pos = line.end()
+                    continue
+            if m is None or m.lastgroup is None:
+                break
+            self.append(self.text[pos : m.start()], None)
+            after: Optional[int] = self.token(m.lastgroup, m)
+            if after is None:
+                after = self.next_token(m.lastgroup, m)
+            if after is None:  # No token here, output the character as is
+                self.append(self.text[m.start()], None)
+                after = m.start() + 1
+            pos = after
+        self.append(self.text[pos:], None)
+        return "".join(self.output)
+
+
+# Convert SPIP markup of text to Markdown, or remove it if not keep_markup
+def convert(text: str, keep_markup: bool = True) -> str:
+    return Tokenizer(text, keep_markup).convert()
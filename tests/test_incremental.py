@@ -0,0 +1,108 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Export a synthetic site incrementally, modify it, and check that exporting it again
+# gives the same files as a new export
+from os import readlink, walk
+from os.path import dirname, exists, islink, join, relpath
+from sqlite3 import connect
+from subprocess import run
+from sys import executable
+from typing import Any
+
+from pytest import fixture, mark
+from yaml import dump
+
+from benchmarks.site import Site
+
+ROOT: str = dirname(dirname(__file__))
+
+
+# Generate the site into workdir, in which documents are attached to many articles
+@fixture
+def workdir(tmp_path: Any) -> str:
+    path: str = str(tmp_path)
+    Site(
+        sections=8,
+        depth=3,
+        articles=60,
+        documents=10,
+        authors=5,
+        keywords=5,
+        links=0.1,
+        text_size=400,
+        document_size=100,
+        seed=3,
+    ).write(join(path, "site.sqlite"), join(path, "IMG/"))
+    return path
+
+
+# Export the site of workdir into its directory name, in a new process as the
+# configuration of spip2md is global, and return the files written by path: the
+# content of files, or the target of symbolic links, checking that none is dangling
+def export(workdir: str, name: str, **options: Any) -> dict[str, bytes | str]:
+    config: dict[str, Any] = {
+        "db_type": "sqlite",
+        "db": join(workdir, "site.sqlite"),
+        "data_dir": join(workdir, "IMG/"),
+        "output_dir": join(workdir, name + "/"),
+        "logfile": join(workdir, name + ".log"),
+        "manifest": join(workdir, name + ".json"),
+        "export_languages": ["fr", "en"],
+        "storage_language": "fr",
+        **options,
+    }
+    config_file: str = join(workdir, name + ".yml")
+    with open(config_file, "w") as f:
+        f.write(dump(config))
+    run([executable, "-m", "spip2md", config_file], cwd=ROOT, check=True)
+    files: dict[str, bytes | str] = {}
+    for directory, directories, names in walk(config["output_dir"]):
+        assert len(directories) + len(names) > 0, f"Empty directory {directory}"
+        for file in names:
+            path: str = join(directory, file)
+            key: str = relpath(path, config["output_dir"])
+            if islink(path):
+                assert exists(path), f"Dangling link {key}"
+                files[key] = readlink(path)
+            else:
+                with open(path, "rb") as f:
+                    files[key] = f.read()
+    return files
+
+
+@mark.parametrize(
+    "options",
+    (
+        {},
+        {"deduplicate_documents": "symlink"},
+        {"deduplicate_documents": "symlink", "write_changed_only": True},
+        {"deduplicate_documents": "hardlink"},
+    ),
+)
+def test_incremental_export_after_renaming_sections(
+    workdir: str, options: dict[str, Any]
+) -> None:
+    export(workdir, "incremental", incremental=True, **options)
+    # Move the directories of sections, and of everything in them
+    db = connect(join(workdir, "site.sqlite"))
+    db.execute(
+        "UPDATE spip_rubriques SET titre = 'Renamed ' || titre,"
+        + " maj = '2030-01-01 00:00:00'"
+    )
+    db.commit()
+    db.close()
+    incremental = export(workdir, "incremental", incremental=True, **options)
+    assert incremental == export(workdir, "new", **options)
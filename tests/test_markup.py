@@ -0,0 +1,142 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Convert SPIP markup with both markup engines: the synthetic markup of
+# benchmarks.corpus, that they must convert alike unless SPIP_MARKDOWN spans several
+# brackets or lines, and examples of the differences listed at the top of tokenizer.py
+from pytest import mark
+
+from benchmarks.corpus import Corpus
+from spip2md.extended_models import SpipWritable
+from spip2md.regexmaps import SPIP_MARKDOWN
+from spip2md.tokenizer import convert as tokenize
+
+# Patterns of SPIP_MARKDOWN that can span several brackets or lines, unlike tokens,
+# with the characters that their matches then contain
+SPANNING: dict[str, str] = {
+    r"\[ *(.*?) *-> *(.*?) *\]": "[]",  # anchor
+    r"\[\? *(.*?) *\]": "[]",  # wikilink
+    r"(\r?\n)\|\|(.*?)\|(.*?)\|\|": "\n",  # table metadata
+}
+
+# (Markup, keep_markup, output of SPIP_MARKDOWN, output of the tokenizer) of the
+# differences between the engines
+DIFFERENCES: tuple[tuple[str, bool, str, str], ...] = (
+    # Anchors, wikilinks & tables metadata can’t span several brackets or lines
+    (
+        "<multi>[fr] Voir [le site->https://example.org] [en] See the site</multi>",
+        False,
+        "<multi>fr] Voir [le site [en] See the site</multi>",
+        "<multi>[fr] Voir le site [en] See the site</multi>",
+    ),
+    (
+        "[?Paris] est sur [le site->https://example.org]",
+        False,
+        "?Paris] est sur [le site",
+        "Paris est sur le site",
+    ),
+    (
+        "Voir [?Paris et [en] Paris]",
+        True,
+        "Voir [Paris et [en](https://wikipedia.org/wiki/Paris et [en) Paris]",
+        "Voir [?Paris et [en] Paris]",
+    ),
+    (
+        "Voir [?Paris et [en] Paris]",
+        False,
+        "Voir Paris et [en Paris]",
+        "Voir [?Paris et [en] Paris]",
+    ),
+    (
+        "Début\n||Légende||\n| a | b |\n\nTexte\n\n||Autre||\n| c | d |",
+        True,
+        "DébutAutre||\n| c | d |",
+        "Début\n||Légende||\n| a | b |\n\nTexte\n\n||Autre||\n| c | d |",
+    ),
+    (
+        "Début\n||Légende||\n| a | b |\n\nTexte\n\n||Autre||\n| c | d |",
+        False,
+        "Début\nAutre||\n| c | d |",
+        "Début\n||Légende||\n| a | b |\n\nTexte\n\n||Autre||\n| c | d |",
+    ),
+    # A closing mark is the first one after the opening mark, even if it’s part of a
+    # token of higher priority that spans over it
+    (
+        "<quote>Citation {{en gras</quote> après}}",
+        True,
+        "> Citation **en gras après** ",
+        "> Citation {{en gras après}}",
+    ),
+    (
+        "<quote>Citation {{en gras</quote> après}}",
+        False,
+        "Citation en gras après",
+        "Citation {{en gras après}}",
+    ),
+    # Markdown output is never taken for SPIP markup
+    ("Liste :\n-{{gras}}", True, "Liste :\n- *gras** ", "Liste :\n- **gras** "),
+)
+
+
+# Titles, long & short texts and words of the corpus, with their markup
+def fields() -> list[str]:
+    corpus = Corpus(0)
+    fields: list[str] = []
+    for _ in range(150):
+        fields += [
+            corpus.title(),
+            corpus.text(1000),
+            corpus.text(200),
+            corpus.words(10),
+        ]
+    return fields
+
+
+# If a pattern of SPANNING matches several brackets or lines while SPIP_MARKDOWN
+# converts field, looking inside its matches, without the marks they begin & end with
+def spans(field: str, keep_markup: bool) -> bool:
+    for old, new in SPIP_MARKDOWN:
+        if old.pattern in SPANNING:
+            for m in old.finditer(field):
+                inside: str = m.group().strip()[1:-1]
+                if any(char in inside for char in SPANNING[old.pattern]):
+                    return True
+        field = SpipWritable.apply_mapping(field, ((old, new),), keep_markup)
+    return False
+
+
+def test_engines_convert_corpus_alike() -> None:
+    assert all(p in (old.pattern for old, _ in SPIP_MARKDOWN) for p in SPANNING)
+    conversions: int = 0
+    compared: int = 0
+    for field in fields():
+        for keep_markup in (True, False):
+            conversions += 1
+            if spans(field, keep_markup):
+                continue
+            compared += 1
+            assert tokenize(field, keep_markup) == SpipWritable.apply_mapping(
+                field, SPIP_MARKDOWN, keep_markup
+            )
+    # Most of the corpus doesn’t make SPIP_MARKDOWN span brackets or lines
+    assert compared > conversions // 2
+
+
+@mark.parametrize("markup, keep_markup, regex, tokenizer", DIFFERENCES)
+def test_listed_differences(
+    markup: str, keep_markup: bool, regex: str, tokenizer: str
+) -> None:
+    assert SpipWritable.apply_mapping(markup, SPIP_MARKDOWN, keep_markup) == regex
+    assert tokenize(markup, keep_markup) == tokenizer
@@ -0,0 +1,185 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Read small dumps written like mysqldump & other tools write them
+import gzip
+from os.path import join
+from typing import Any
+
+from pytest import raises
+
+from spip2md.mysqldump import DumpReader, DumpSyntaxError, Row
+
+# Definition of the table read by the tests, as mysqldump writes it
+CREATE: str = """--
+-- Table structure for table `spip_mots`
+--
+
+DROP TABLE IF EXISTS `spip_mots`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `spip_mots` (
+  `id_mot` bigint(21) NOT NULL AUTO_INCREMENT,
+  `titre` text NOT NULL,
+  `descriptif` text,
+  PRIMARY KEY (`id_mot`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+"""
+
+
+# Write dump into a file of tmp_path, and return the rows of every batch read from it
+def read(tmp_path: Any, dump: str, name: str = "dump.sql", **options: Any) -> list:
+    path: str = join(str(tmp_path), name)
+    if name.endswith(".gz"):
+        with gzip.open(path, "wt", encoding=options.get("encoding", "utf-8")) as f:
+            f.write(dump)
+    else:
+        with open(path, "w", encoding=options.get("encoding", "utf-8")) as f:
+            f.write(dump)
+    rows: list[Row] = []
+    for table, columns, batch in DumpReader(path, ("spip_mots",), **options).read():
+        assert table == "spip_mots"
+        assert columns == ("id_mot", "titre", "descriptif")
+        rows += batch
+    return rows
+
+
+def test_multi_row_insert(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        + "LOCK TABLES `spip_mots` WRITE;\n"
+        + "INSERT INTO `spip_mots` VALUES (1,'un','premier'),(2,'deux','second');\n"
+        + "INSERT INTO `spip_mots` VALUES (3,'trois','troisième');\n"
+        + "UNLOCK TABLES;\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "un", "premier"),
+        (2, "deux", "second"),
+        (3, "trois", "troisième"),
+    ]
+
+
+def test_escaped_quotes(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        + "INSERT INTO `spip_mots` VALUES"
+        + r" (1,'l\'été','it''s'),(2,'\"guillemets\"','fin\\'),(3,'''','\'');"
+        + "\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "l'été", "it's"),
+        (2, '"guillemets"', "fin\\"),
+        (3, "'", "'"),
+    ]
+
+
+def test_backslash_escapes(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        + "INSERT INTO `spip_mots` VALUES"
+        + r" (1,'a\nb\r\nc\td','\\n \0 \Z \% \_ \b');"
+        + "\n"
+    )
+    # Outside of patterns, MySQL keeps the backslash of \% and \_
+    assert read(tmp_path, dump) == [
+        (1, "a\nb\r\nc\td", "\\n \0 \x1a \\% \\_ \b"),
+    ]
+
+
+def test_null_and_numbers(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        + "INSERT INTO `spip_mots` VALUES (1,'NULL',NULL),(-2,'',null),"
+        + "(3,'1.5',2.5e3);\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "NULL", None),
+        (-2, "", None),
+        (3, "1.5", 2500.0),
+    ]
+
+
+def test_values_split_across_lines(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        # One row per line, like phpMyAdmin, with explicit columns
+        + "INSERT INTO `spip_mots` (`id_mot`, `titre`, `descriptif`) VALUES\n"
+        + "(1, 'un', 'premier'),\n"
+        + "(2, 'deux', 'second');\n"
+        # Line breaks kept as is in strings
+        + "INSERT INTO `spip_mots` VALUES (3,'trois','ligne\n"
+        + "\n"
+        + "suite, (4,\\'x\\');\n"
+        + "fin'),(4,'quatre',NULL);\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "un", "premier"),
+        (2, "deux", "second"),
+        (3, "trois", "ligne\n\nsuite, (4,'x');\nfin"),
+        (4, "quatre", None),
+    ]
+
+
+def test_binary_data(tmp_path: Any) -> None:
+    dump: str = (
+        CREATE
+        + "INSERT INTO `spip_mots` VALUES"
+        + r" (1,_binary 'bin\0aire\'s',0x68C3A97861),(2,0x,_binary '');"
+        + "\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "bin\0aire's", "héxa"),
+        (2, "", ""),
+    ]
+
+
+def test_comments_and_other_tables(tmp_path: Any) -> None:
+    dump: str = (
+        "-- MySQL dump 10.13  Distrib 8.0.33\n"
+        + "/*!40101 SET NAMES utf8mb4 */;\n"
+        + CREATE
+        + "-- INSERT INTO `spip_mots` VALUES (9,'commentaire',NULL);\n"
+        + "/*!40000 ALTER TABLE `spip_mots` DISABLE KEYS */;\n"
+        + "INSERT INTO `spip_mots` VALUES (1,'-- pas un commentaire','/* non */');\n"
+        + "/*!40000 ALTER TABLE `spip_mots` ENABLE KEYS */;\n"
+        + "INSERT INTO `spip_meta` VALUES ('nom','valeur'),\n"
+        + "('autre','(2,\\'autre\\',NULL)');\n"
+        + "INSERT INTO `spip_mots` VALUES (2,'deux',NULL);\n"
+    )
+    assert read(tmp_path, dump) == [
+        (1, "-- pas un commentaire", "/* non */"),
+        (2, "deux", None),
+    ]
+
+
+def test_compressed_dump(tmp_path: Any) -> None:
+    dump: str = CREATE + "INSERT INTO `spip_mots` VALUES (1,'un',NULL);\n"
+    assert read(tmp_path, dump, "dump.sql.gz") == [(1, "un", None)]
+
+
+def test_dump_encoding(tmp_path: Any) -> None:
+    dump: str = CREATE + "INSERT INTO `spip_mots` VALUES (1,'été',NULL);\n"
+    assert read(tmp_path, dump, encoding="latin-1") == [(1, "été", None)]
+    # Read as UTF-8, which it isn’t
+    with raises(DumpSyntaxError):
+        list(DumpReader(join(str(tmp_path), "dump.sql"), ("spip_mots",)).read())
+
+
+def test_unknown_value(tmp_path: Any) -> None:
+    dump: str = CREATE + "INSERT INTO `spip_mots` VALUES (1,titre,NULL);\n"
+    with raises(DumpSyntaxError):
+        read(tmp_path, dump)
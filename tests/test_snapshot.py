@@ -0,0 +1,117 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Take snapshots of a synthetic site with the snapshot command, and export them
+from os import makedirs, walk
+from os.path import dirname, isfile, join, relpath
+from sqlite3 import connect
+from subprocess import run
+from sys import executable
+from typing import Any
+
+from pytest import fixture, mark
+from yaml import dump
+
+from benchmarks.site import Site
+
+ROOT: str = dirname(dirname(__file__))
+
+
+# Generate the site into workdir
+@fixture(scope="module")
+def workdir(tmp_path_factory: Any) -> str:
+    path: str = str(tmp_path_factory.mktemp("site"))
+    Site(
+        sections=8,
+        depth=3,
+        articles=60,
+        documents=20,
+        authors=6,
+        keywords=6,
+        links=0.2,
+        text_size=400,
+        document_size=100,
+        seed=2,
+    ).write(join(path, "site.sqlite"), join(path, "IMG/"))
+    # Store links in another order than the snapshot, as sites add and remove them
+    db = connect(join(path, "site.sqlite"))
+    for table in ("spip_auteurs_liens", "spip_mots_liens", "spip_documents_liens"):
+        db.execute(f"CREATE TEMP TABLE links AS SELECT * FROM {table}")
+        db.execute(f"DELETE FROM {table}")
+        db.execute(
+            f"INSERT INTO {table} SELECT * FROM links ORDER BY id_objet, rowid DESC"
+        )
+        db.execute("DROP TABLE links")
+    db.commit()
+    db.close()
+    return path
+
+
+# Write a configuration file named name to export the site of workdir, and return it
+def configure(workdir: str, name: str, **options: Any) -> str:
+    config: dict[str, Any] = {
+        "db_type": "sqlite",
+        "db": join(workdir, "site.sqlite"),
+        "db_snapshot": join(workdir, name + ".sqlite"),
+        "data_dir": join(workdir, "IMG/"),
+        "output_dir": join(workdir, name + "/"),
+        "logfile": join(workdir, name + ".log"),
+        "export_languages": ["fr", "en"],
+        "storage_language": "fr",
+        **options,
+    }
+    config_file: str = join(workdir, name + ".yml")
+    with open(config_file, "w") as f:
+        f.write(dump(config))
+    return config_file
+
+
+# Run spip2md with args, in a new process as its configuration is global
+def spip2md(*args: str) -> None:
+    run([executable, "-m", "spip2md", *args], cwd=ROOT, check=True)
+
+
+# Export with the configuration file named name, and return the written files by path
+def export(workdir: str, name: str) -> dict[str, bytes]:
+    spip2md(join(workdir, name + ".yml"))
+    files: dict[str, bytes] = {}
+    for directory, _, names in walk(join(workdir, name)):
+        for file in names:
+            with open(join(directory, file), "rb") as f:
+                files[relpath(join(directory, file), join(workdir, name))] = f.read()
+    return files
+
+
+def test_snapshot_command_after_configuration(workdir: str) -> None:
+    config_file: str = configure(workdir, "after")
+    # An export would remove the output directory first
+    makedirs(join(workdir, "after/"))
+    with open(join(workdir, "after/kept.md"), "w") as f:
+        f.write("Not exported")
+    spip2md(config_file, "snapshot")
+    assert isfile(join(workdir, "after.sqlite"))
+    assert isfile(join(workdir, "after/kept.md"))
+
+
+@mark.parametrize("preload", (False, True))
+def test_snapshot_exports_like_source(workdir: str, preload: bool) -> None:
+    name: str = "preload" if preload else "query"
+    configure(workdir, name + "_source", preload=preload)
+    source: dict[str, bytes] = export(workdir, name + "_source")
+    spip2md(configure(workdir, name), "snapshot")
+    configure(workdir, name, db_type="snapshot", preload=preload)
+    copy: dict[str, bytes] = export(workdir, name)
+    assert sorted(copy) == sorted(source)
+    assert [path for path in source if copy[path] != source[path]] == []
@@ -0,0 +1,112 @@
+"""
+This file is part of spip2md.
+Copyright (C) 2023 LCPQ/Guilhem Fauré
+
+spip2md is free software: you can redistribute it and/or modify it under the terms of
+the GNU General Public License version 2 as published by the Free Software Foundation.
+
+spip2md is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with spip2md.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+# Export a synthetic site with many colliding titles in both traversal modes, and
+# check that they write the same files, of which internal links all resolve
+import re
+from os import walk
+from os.path import dirname, join, normpath, relpath
+from sqlite3 import connect
+from subprocess import run
+from sys import executable
+from typing import Any
+
+from pytest import fixture
+from yaml import dump
+
+from benchmarks.site import Site
+
+ROOT: str = dirname(dirname(__file__))
+# Relative links written by spip2md, to .md files or to documents
+RELATIVE_LINK = re.compile(r"\]\(((?:\.\./)*[^():/\s]+(?:/[^():/\s]+)*\.[a-z]+)\)")
+
+
+# Generate the site into workdir, then give the same titles to many of its objects
+@fixture(scope="module")
+def workdir(tmp_path_factory: Any) -> str:
+    path: str = str(tmp_path_factory.mktemp("site"))
+    Site(
+        sections=12,
+        depth=3,
+        articles=120,
+        documents=30,
+        authors=5,
+        keywords=5,
+        links=0.2,
+        text_size=800,
+        document_size=100,
+        seed=1,
+    ).write(join(path, "site.sqlite"), join(path, "IMG/"))
+    db = connect(join(path, "site.sqlite"))
+    # Same titles in one language or in both, with translations in <multi> blocks
+    db.execute(
+        """UPDATE spip_articles SET titre = CASE id_article % 3
+        WHEN 0 THEN 'Same title'
+        WHEN 1 THEN '<multi>[fr]Titre commun[en]Common ' || (id_article % 5)
+            || '</multi>'
+        ELSE titre END WHERE id_article % 4 != 0"""
+    )
+    db.execute(
+        "UPDATE spip_rubriques SET titre = 'Same title' WHERE id_rubrique % 3 = 0"
+    )
+    db.commit()
+    db.close()
+    return path
+
+
+# Export the site of workdir into its directory name, in a new process as the
+# configuration of spip2md is global, and return the files written by path
+def export(workdir: str, name: str, **options: Any) -> dict[str, bytes]:
+    config: dict[str, Any] = {
+        "db_type": "sqlite",
+        "db": join(workdir, "site.sqlite"),
+        "data_dir": join(workdir, "IMG/"),
+        "output_dir": join(workdir, name + "/"),
+        "logfile": join(workdir, name + ".log"),
+        "export_languages": ["fr", "en"],
+        "storage_language": "fr",
+        **options,
+    }
+    config_file: str = join(workdir, name + ".yml")
+    with open(config_file, "w") as f:
+        f.write(dump(config))
+    run([executable, "-m", "spip2md", config_file], cwd=ROOT, check=True)
+    files: dict[str, bytes] = {}
+    for directory, _, names in walk(config["output_dir"]):
+        for file in names:
+            with open(join(directory, file), "rb") as f:
+                files[relpath(join(directory, file), config["output_dir"])] = f.read()
+    return files
+
+
+def test_single_traversal_writes_same_files(workdir: str) -> None:
+    multi_pass: dict[str, bytes] = export(workdir, "multi_pass")
+    single: dict[str, bytes] = export(workdir, "single", single_traversal=True)
+    assert sorted(single) == sorted(multi_pass)
+    assert [path for path in multi_pass if single[path] != multi_pass[path]] == []
+
+
+def test_links_point_to_written_files(workdir: str) -> None:
+    files: dict[str, bytes] = export(workdir, "links", preload=True)
+    links: int = 0
+    broken: list[tuple[str, str]] = []
+    for path, content in files.items():
+        if path.endswith(".md"):
+            for m in RELATIVE_LINK.finditer(content.decode()):
+                links += 1
+                if normpath(join(dirname(path), m.group(1))) not in files:
+                    broken.append((path, m.group(1)))
+    assert links > 0
+    assert broken == []